@@ -0,0 +1,101 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from redis.asyncio import Redis
+
+from cognitus_ai.config import AuthSettings, config
+from cognitus_ai.database import redis_client
+from cognitus_ai.utils import fastjson
+from cognitus_ai.utils.logging import logger
+from .schemas import User
+
+
+class UserCache:
+    """Two-tier cache of authenticated users, keyed by token subject (email).
+
+    The first tier is a bounded in-process LRU with a TTL; the optional second tier
+    is Redis, shared by all workers. Entries never include the password hash.
+    `invalidate` clears both tiers, but other workers' in-process copies live until
+    their TTL runs out, so keep `user_cache_ttl_seconds` short.
+    """
+
+    def __init__(self, redis: Redis, settings: AuthSettings, prefix: str = "user_cache:"):
+        self.redis = redis
+        self.settings = settings
+        self.prefix = prefix
+        self._local: "OrderedDict[str, tuple[float, User]]" = OrderedDict()
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _get_key(self, email: str) -> str:
+        return f"{self.prefix}{email}"
+
+    def _set_local(self, email: str, user: User) -> None:
+        self._local[email] = (time.monotonic() + self.settings.user_cache_ttl_seconds, user)
+        self._local.move_to_end(email)
+        while len(self._local) > self.settings.user_cache_size:
+            self._local.popitem(last=False)
+
+    async def get(self, email: str) -> Optional[User]:
+        if self.settings.user_cache_ttl_seconds <= 0:
+            return None
+
+        entry = self._local.get(email)
+        if entry is not None:
+            expires_at, user = entry
+            if expires_at > time.monotonic():
+                self._local.move_to_end(email)
+                self.hits += 1
+                return user.model_copy()
+            del self._local[email]
+
+        if self.settings.user_cache_redis:
+            try:
+                raw = await self.redis.get(self._get_key(email))
+            except Exception as e:
+                logger.warning(f"User cache Redis lookup failed: {e}")
+                raw = None
+            if raw:
+                # Validate in python mode so the id comes back as an ObjectId, as from Mongo
+                user = User(**fastjson.loads(raw))
+                self._set_local(email, user)
+                self.redis_hits += 1
+                return user.model_copy()
+
+        self.misses += 1
+        return None
+
+    async def set(self, email: str, user: User) -> None:
+        if self.settings.user_cache_ttl_seconds <= 0:
+            return
+
+        self._set_local(email, user)
+        if self.settings.user_cache_redis:
+            try:
+                await self.redis.set(
+                    self._get_key(email), user.model_dump_json(), ex=max(1, int(self.settings.user_cache_ttl_seconds))
+                )
+            except Exception as e:
+                logger.warning(f"User cache Redis write failed: {e}")
+
+    async def invalidate(self, email: str) -> None:
+        self._local.pop(email, None)
+        if self.settings.user_cache_redis:
+            try:
+                await self.redis.delete(self._get_key(email))
+            except Exception as e:
+                logger.warning(f"User cache Redis delete failed: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "size": len(self._local),
+            "max_size": self.settings.user_cache_size,
+        }
+
+
+user_cache = UserCache(redis_client, config.auth)
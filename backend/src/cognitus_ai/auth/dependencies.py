@@ -3,6 +3,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from .utils import decode_token
 from .service import auth_service
+from .cache import user_cache
 from .schemas import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
@@ -21,8 +22,14 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> Use
     if email is None:
         raise credentials_exception
         
+    cached_user = await user_cache.get(email)
+    if cached_user is not None:
+        return cached_user
+
     user = await auth_service.get_user_by_email(email)
     if user is None:
         raise credentials_exception
         
-    return User(**user.model_dump())
+    current_user = User(**user.model_dump())
+    await user_cache.set(email, current_user)
+    return current_user
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from cognitus_ai.config import AuthSettings, config
+from .utils import get_password_hash, verify_password
+
+T = TypeVar("T")
+
+
+class PasswordPoolSaturated(Exception):
+    """Raised instead of queueing when too much password work is already waiting."""
+
+
+class PasswordPool:
+    """Runs bcrypt off the event loop on a small dedicated thread pool.
+
+    bcrypt releases the GIL, so hashing in threads keeps every other request and
+    stream on the worker responsive. At most `password_workers` hashes run at once
+    and `password_queue_size` more may wait; beyond that callers are rejected
+    immediately rather than piling up behind a login burst. A job counts as
+    pending until it leaves the executor, even if its caller has gone away.
+    """
+
+    def __init__(self, settings: AuthSettings):
+        self.settings = settings
+        self._executor: ThreadPoolExecutor | None = None
+        # Done callbacks run on the worker threads
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.settings.password_workers, thread_name_prefix="password"
+            )
+        return self._executor
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self.pending >= self.settings.password_workers + self.settings.password_queue_size:
+                self.rejected += 1
+                raise PasswordPoolSaturated("Too many concurrent password operations")
+            self.pending += 1
+
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.settings.password_workers,
+            "queue_size": self.settings.password_queue_size,
+            "pending": self.pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "bcrypt_rounds": self.settings.bcrypt_rounds,
+        }
+
+
+password_pool = PasswordPool(config.auth)
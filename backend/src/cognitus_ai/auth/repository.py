@@ -2,34 +2,141 @@ from redis.asyncio.client import Redis
 from datetime import timedelta
 from cognitus_ai.database import redis_client
 
+# Store a token and add it to its owner's family.
+# KEYS: token key, family key; ARGV: owner, ttl seconds, token
+STORE_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('SADD', KEYS[2], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# Swap the old token for the new one, only if the old one is still live and owned by ARGV[1].
+# KEYS: old token key, new token key, family key; ARGV: owner, ttl seconds, token key prefix
+ROTATE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+local prefix_len = #ARGV[3]
+redis.call('DEL', KEYS[1])
+redis.call('SREM', KEYS[3], string.sub(KEYS[1], prefix_len + 1))
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+redis.call('SADD', KEYS[3], string.sub(KEYS[2], prefix_len + 1))
+redis.call('EXPIRE', KEYS[3], ARGV[2])
+return 1
+"""
+
+# Delete a token and remove it from its owner's family, if it still belongs to ARGV[1].
+# KEYS: token key, family key; ARGV: owner, token
+DELETE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SREM', KEYS[2], ARGV[2])
+return 1
+"""
+
 class TokenRepository:
-    def __init__(self, prefix: str = "refresh_token:"):
+    """Refresh tokens in Redis, one key per token plus a per-user family set.
+
+    Storing, rotating and deleting a token are each a Lua script, so rotation is
+    atomic (two concurrent refreshes with the same token cannot both succeed).
+    The family set lets all of a user's sessions be revoked without a key scan;
+    members whose token has expired are pruned when a new one is stored. Scripts
+    only touch the keys they are given, as Redis requires.
+    """
+
+    def __init__(self, prefix: str = "refresh_token:", family_prefix: str = "refresh_token_family:"):
         self.client: Redis = redis_client
         self.prefix = prefix
+        self.family_prefix = family_prefix
+        self._store_script = self.client.register_script(STORE_SCRIPT)
+        self._rotate_script = self.client.register_script(ROTATE_SCRIPT)
+        self._delete_script = self.client.register_script(DELETE_SCRIPT)
 
     def _get_key(self, token: str) -> str:
         return f"{self.prefix}{token}"
 
+    def _get_family_key(self, value: str) -> str:
+        return f"{self.family_prefix}{value}"
+
+    async def _prune_family(self, value: str) -> None:
+        family_key = self._get_family_key(value)
+        members = list(await self.client.smembers(family_key))
+        if not members:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for member in members:
+                pipe.exists(self._get_key(member))
+            live = await pipe.execute()
+        expired = [member for member, exists in zip(members, live) if not exists]
+        if expired:
+            await self.client.srem(family_key, *expired)
+
     async def set_token(self, token: str, value: str, ttl: timedelta):
-        await self.client.set(self._get_key(token), value, ex=ttl)
+        await self._prune_family(value)
+        await self._store_script(
+            keys=[self._get_key(token), self._get_family_key(value)],
+            args=[value, int(ttl.total_seconds()), token],
+        )
+
+    async def rotate_token(self, old_token: str, new_token: str, value: str, ttl: timedelta) -> bool:
+        """Replace `old_token` with `new_token`; False if the old one was already used or revoked."""
+        rotated = await self._rotate_script(
+            keys=[self._get_key(old_token), self._get_key(new_token), self._get_family_key(value)],
+            args=[value, int(ttl.total_seconds()), self.prefix],
+        )
+        return bool(rotated)
 
     async def get_token(self, token: str) -> str | None:
         return await self.client.get(self._get_key(token))
 
     async def delete_token(self, token: str):
-        await self.client.delete(self._get_key(token))
+        owner = await self.client.get(self._get_key(token))
+        if owner is None:
+            return
+        await self._delete_script(
+            keys=[self._get_key(token), self._get_family_key(owner)], args=[owner, token]
+        )
+
+    async def delete_family(self, value: str) -> int:
+        """Delete every token stored for `value` (the user's email); returns how many there were."""
+        family_key = self._get_family_key(value)
+        members = list(await self.client.smembers(family_key))
+        async with self.client.pipeline(transaction=True) as pipe:
+            for member in members:
+                pipe.delete(self._get_key(member))
+            pipe.delete(family_key)
+            await pipe.execute()
+        return len(members)
 
     async def exists(self, token: str) -> bool:
         return await self.client.exists(self._get_key(token)) > 0
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from .schemas import UserInDB
+from pymongo.errors import DuplicateKeyError
+from .schemas import User, UserInDB
+
+# Everything except the password hash, for lookups that only need the profile
+USER_PROJECTION = {"hashed_password": 0}
 
 class UserRepository:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.collection = db["users"]
 
-    async def get_by_email(self, email: str) -> UserInDB | None:
+    async def ensure_indexes(self) -> None:
+        # Enforces one account per email; also serves every lookup by email
+        await self.collection.create_index("email", unique=True)
+
+    async def get_by_email(self, email: str) -> User | None:
+        user_dict = await self.collection.find_one({"email": email}, USER_PROJECTION)
+        if user_dict:
+            user_dict["id"] = user_dict.get("id") or user_dict.get("_id")
+            return User(**user_dict)
+        return None
+
+    async def get_with_password_by_email(self, email: str) -> UserInDB | None:
         user_dict = await self.collection.find_one({"email": email})
         if user_dict:
             # MongoDB uses _id, but our schema uses id (UUID)
@@ -40,9 +147,13 @@ class UserRepository:
         return None
 
     async def create(self, user: UserInDB) -> UserInDB:
+        """Insert a new user; raises ValueError if the email is already registered."""
         # Exclude id so MongoDB will generate _id (ObjectId)
         user_dict = user.model_dump(exclude={"id"})
-        result = await self.collection.insert_one(user_dict)
+        try:
+            result = await self.collection.insert_one(user_dict)
+        except DuplicateKeyError:
+            raise ValueError("User with this email already exists")
         # Map generated _id back to schema's id
         user_dict["id"] = result.inserted_id
         return UserInDB(**user_dict)
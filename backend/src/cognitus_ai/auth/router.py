@@ -1,10 +1,19 @@
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Cookie
+from fastapi.responses import PlainTextResponse
 
 from .schemas import Token, LoginRequest, User, LoginResponse, UserCreate
 from .service import auth_service
-from .utils import create_access_token, create_refresh_token, decode_token
+from .utils import create_access_token, create_refresh_token, decode_token, get_public_key_pem
 from .dependencies import get_current_user
+from .passwords import PasswordPoolSaturated
+
+def _too_many_password_requests() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts in progress, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -18,10 +27,15 @@ async def signup(user_data: UserCreate):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
+    except PasswordPoolSaturated:
+        raise _too_many_password_requests()
 
 @router.post("/login", response_model=LoginResponse)
 async def login(login_data: LoginRequest, response: Response):
-    user = await auth_service.authenticate_user(login_data.email, login_data.password)
+    try:
+        user = await auth_service.authenticate_user(login_data.email, login_data.password)
+    except PasswordPoolSaturated:
+        raise _too_many_password_requests()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -69,16 +83,13 @@ async def refresh_token(response: Response, refresh_token: Annotated[str | None,
             detail="Invalid token payload: email missing or not a string",
         )
     
-    if not await auth_service.is_refresh_token_valid(token):
+    new_refresh_token = create_refresh_token(data={"sub": email})
+    if not await auth_service.rotate_refresh_token(token, new_refresh_token, email):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Refresh token has been revoked or is invalid",
         )
-
-    await auth_service.revoke_refresh_token(token)
     new_access_token = create_access_token(data={"sub": email})
-    new_refresh_token = create_refresh_token(data={"sub": email})
-    await auth_service.store_refresh_token(new_refresh_token, email)
     
     response.set_cookie(
         key="refresh_token",
@@ -97,10 +108,32 @@ async def refresh_token(response: Response, refresh_token: Annotated[str | None,
 async def logout(response: Response, refresh_token: Annotated[str | None, Cookie()] = None):
     if refresh_token:
         await auth_service.revoke_refresh_token(refresh_token)
+        payload = decode_token(refresh_token)
+        email = payload.get("sub") if payload else None
+        if isinstance(email, str):
+            await auth_service.invalidate_user(email)
     
     response.delete_cookie(key="refresh_token")
     return {"message": "Successfully logged out"}
 
+@router.post("/logout-all")
+async def logout_all(response: Response, current_user: Annotated[User, Depends(get_current_user)]):
+    revoked = await auth_service.revoke_all_refresh_tokens(current_user.email)
+    await auth_service.invalidate_user(current_user.email)
+
+    response.delete_cookie(key="refresh_token")
+    return {"message": "Successfully logged out of all sessions", "revoked_sessions": revoked}
+
 @router.get("/me", response_model=User)
 async def read_users_me(current_user: Annotated[User, Depends(get_current_user)]):
     return current_user
+
+@router.get("/public-key", response_class=PlainTextResponse)
+async def public_key():
+    pem = get_public_key_pem()
+    if pem is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Tokens are signed with a shared secret",
+        )
+    return pem
@@ -1,40 +1,100 @@
 from typing import Any
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import hashlib
+import time
 import jwt
 import bcrypt
-from cognitus_ai.config import config
+from cognitus_ai.config import AuthSettings, config
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def get_password_hash(password: str) -> str:
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=config.auth.bcrypt_rounds)
     return bcrypt.hashpw(pwd_bytes, salt).decode('utf-8')
 
+def _load_keys(settings: AuthSettings) -> tuple[Any, Any]:
+    """Prepare the signing and verification key objects once, at import time.
+
+    HS* algorithms use `secret_key` for both. Asymmetric algorithms (RS*, ES*, PS*,
+    EdDSA) sign with `private_key_file` and verify with `public_key_file`, so other
+    services can verify tokens with only the public key; they need `pyjwt[crypto]`.
+    """
+    algorithms = jwt.algorithms.get_default_algorithms()
+    if settings.algorithm not in algorithms:
+        raise RuntimeError(
+            f"JWT algorithm {settings.algorithm} is not available; install pyjwt[crypto] for asymmetric algorithms"
+        )
+    algorithm = algorithms[settings.algorithm]
+
+    if settings.algorithm.startswith("HS"):
+        key = algorithm.prepare_key(settings.secret_key)
+        return key, key
+
+    signing_key = None
+    if settings.private_key_file:
+        signing_key = algorithm.prepare_key(Path(settings.private_key_file).read_text())
+    if not settings.public_key_file:
+        raise RuntimeError(f"auth.public_key_file is required for {settings.algorithm}")
+    verifying_key = algorithm.prepare_key(Path(settings.public_key_file).read_text())
+    return signing_key, verifying_key
+
+_signing_key, _verifying_key = _load_keys(config.auth)
+_algorithms = [config.auth.algorithm]
+
+# Verified payloads by token hash, each kept until the token's own `exp`
+_token_cache: "OrderedDict[bytes, tuple[float, dict[str, Any]]]" = OrderedDict()
+_token_cache_stats = {"hits": 0, "misses": 0}
+
+def _create_token(data: dict[str, object], expire: datetime, token_type: str) -> str:
+    if _signing_key is None:
+        raise RuntimeError("auth.private_key_file is required to issue tokens")
+    return jwt.encode({**data, "exp": expire, "type": token_type}, _signing_key, algorithm=config.auth.algorithm)
+
 def create_access_token(data: dict[str, object], expires_delta: timedelta | None = None) -> str:
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=config.auth.access_token_expire_minutes)
-    to_encode.update({"exp": expire, "type": "access"})
-    encoded_jwt = jwt.encode(to_encode, config.auth.secret_key, algorithm=config.auth.algorithm)
-    return encoded_jwt
+    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=config.auth.access_token_expire_minutes))
+    return _create_token(data, expire, "access")
 
 def create_refresh_token(data: dict[str, object], expires_delta: timedelta | None = None) -> str:
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(days=config.auth.refresh_token_expire_days)
-    to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, config.auth.secret_key, algorithm=config.auth.algorithm)
-    return encoded_jwt
+    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(days=config.auth.refresh_token_expire_days))
+    return _create_token(data, expire, "refresh")
 
 def decode_token(token: str) -> dict[str, Any] | None:
+    key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+    cached = _token_cache.get(key)
+    if cached is not None:
+        exp, payload = cached
+        if exp > time.time():
+            _token_cache.move_to_end(key)
+            _token_cache_stats["hits"] += 1
+            return dict(payload)
+        del _token_cache[key]
+
+    _token_cache_stats["misses"] += 1
     try:
-        payload = jwt.decode(token, config.auth.secret_key, algorithms=[config.auth.algorithm])
-        return payload
+        payload = jwt.decode(token, _verifying_key, algorithms=_algorithms)
     except jwt.PyJWTError:
         return None
+
+    exp = payload.get("exp")
+    if config.auth.token_cache_size > 0 and isinstance(exp, (int, float)):
+        _token_cache[key] = (float(exp), payload)
+        if len(_token_cache) > config.auth.token_cache_size:
+            _token_cache.popitem(last=False)
+    return dict(payload)
+
+def token_cache_info() -> dict[str, Any]:
+    return {
+        **_token_cache_stats,
+        "size": len(_token_cache),
+        "max_size": config.auth.token_cache_size,
+    }
+
+def get_public_key_pem() -> str | None:
+    """PEM of the verification key for asymmetric algorithms, None for HS*."""
+    if config.auth.algorithm.startswith("HS") or not config.auth.public_key_file:
+        return None
+    return Path(config.auth.public_key_file).read_text()
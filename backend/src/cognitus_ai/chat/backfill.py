@@ -0,0 +1,11 @@
+import asyncio
+from cognitus_ai.database import mongodb_client
+from .repository import chat_repository
+
+async def main():
+    updated = await chat_repository.backfill_processed_history()
+    print(f"Backfilled processed history for {updated} chats.")
+    mongodb_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
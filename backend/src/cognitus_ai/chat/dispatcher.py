@@ -0,0 +1,161 @@
+import bisect
+import hashlib
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from cognitus_ai.utils.logging import logger
+
+# Upstream answers that mean "this replica cannot take the request", safe to retry elsewhere
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class CircuitBreaker:
+    """Per-endpoint breaker: opens after `failure_threshold` consecutive failures and
+    lets a single trial request through once `recovery_timeout` seconds have passed."""
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.recovery_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def end_trial(self) -> None:
+        # A trial that ends without a verdict (cancelled, local pool timeout, an
+        # unexpected error) must not leave the endpoint blocked for good
+        self.trial_in_flight = False
+
+
+class AgentEndpoint:
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        self.url = url.rstrip("/")
+        self.breaker = breaker
+        self.outstanding = 0
+        self.successes = 0
+        self.failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "state": self.breaker.state,
+            "outstanding": self.outstanding,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+class AgentDispatcher:
+    """Routes agent requests across replicas.
+
+    A session is pinned to one replica by consistent hashing on its id, so a chat
+    keeps hitting the same warm agent and only ~1/N sessions move when a replica is
+    added or removed. If that replica is failing (passively observed, tracked by its
+    circuit breaker) the request goes to the healthy replica with the fewest
+    outstanding requests instead.
+    """
+
+    def __init__(self, urls: List[str], virtual_nodes: int, failure_threshold: int, recovery_timeout: float):
+        self.endpoints = [AgentEndpoint(url, CircuitBreaker(failure_threshold, recovery_timeout)) for url in urls]
+        self._ring: List[tuple[int, AgentEndpoint]] = sorted(
+            (_hash(f"{endpoint.url}#{i}"), endpoint)
+            for endpoint in self.endpoints
+            for i in range(virtual_nodes)
+        )
+        self._ring_keys = [key for key, _ in self._ring]
+
+    def _owner(self, session_id: str) -> AgentEndpoint:
+        idx = bisect.bisect(self._ring_keys, _hash(session_id)) % len(self._ring)
+        return self._ring[idx][1]
+
+    def candidates(self, session_id: str) -> List[AgentEndpoint]:
+        """Endpoints to try, in order: the session's owner, then the rest by load."""
+        owner = self._owner(session_id)
+        others = sorted((e for e in self.endpoints if e is not owner), key=lambda e: e.outstanding)
+        return [owner, *others]
+
+    async def post_json(
+        self, client: httpx.AsyncClient, path: str, session_id: str, payload: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """POST to the best available replica.
+
+        Only failures that guarantee the agent did not start the request (connection
+        errors and 502/503/504) fall through to the next replica; anything else is
+        raised as-is so a run is never started twice.
+        """
+        last_error: Optional[Exception] = None
+        for endpoint in self.candidates(session_id):
+            if not endpoint.breaker.allow_request():
+                continue
+
+            endpoint.outstanding += 1
+            try:
+                resp = await client.post(f"{endpoint.url}{path}", json=payload)
+                if resp.status_code in RETRYABLE_STATUS:
+                    resp.raise_for_status()
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.HTTPStatusError) as e:
+                endpoint.failures += 1
+                endpoint.breaker.record_failure()
+                logger.warning(f"Agent endpoint {endpoint.url} failed ({e!r}); trying next replica")
+                last_error = e
+                continue
+            except httpx.PoolTimeout:
+                # Local pool exhaustion says nothing about the replica's health
+                raise
+            except httpx.TransportError:
+                endpoint.failures += 1
+                endpoint.breaker.record_failure()
+                raise
+            finally:
+                endpoint.outstanding -= 1
+                endpoint.breaker.end_trial()
+
+            if resp.status_code >= 500:
+                # Not retried, as the agent may have started the run, but the replica is unhealthy
+                endpoint.failures += 1
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.successes += 1
+                endpoint.breaker.record_success()
+            resp.raise_for_status()
+            return resp.json()
+
+        if last_error is not None:
+            raise last_error
+        raise httpx.ConnectError("No healthy agent endpoint available")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self.endpoints]
@@ -0,0 +1,116 @@
+import json
+from typing import Any, Iterable, List, Optional
+
+from cognitus_ai.config import config
+from cognitus_ai.utils.parse_action import parse_action
+from .schemas import AssistantMessage, SystemMessage, UserMessage
+
+OUTPUT_URL_PREFIX = f"{config.agent.url.rstrip('/')}/output/"
+
+INSTRUCTION_MARKERS = [
+    "[USER INSTRUCTION]:",
+    "[THIS IS AN OLD INSTRUCTION, NOT THE LATEST ONE]",
+]
+
+class HistoryProjector:
+    """Incrementally turns raw agent history into the frontend-facing view.
+
+    The only state a message needs from the messages before it is the id of the
+    last projected item (the `belongsTo` link of a tool result), so feeding one
+    appended message costs the same no matter how long the history already is.
+    """
+
+    def __init__(self, last_id: Optional[str] = None):
+        self.last_id = last_id
+
+    def feed(self, messages: Iterable[dict[str, Any]] | None) -> List[dict[str, Any]]:
+        new_items: List[dict[str, Any]] = []
+        for msg_dict in messages or []:
+            item = self._project(msg_dict)
+            if item is None:
+                continue
+            new_items.append(item)
+            self.last_id = item["id"]
+        return new_items
+
+    def _project(self, msg_dict: dict[str, Any]) -> Optional[dict[str, Any]]:
+        role = msg_dict.get("role")
+        msg_type = msg_dict.get("type")
+
+        try:
+            if role == "user":
+                msg = UserMessage(**msg_dict)
+            elif role == "assistant":
+                msg = AssistantMessage(**msg_dict)
+            elif role == "system":
+                msg = SystemMessage(**msg_dict)
+            else:
+                return None
+        except Exception:
+            return None
+
+        if role == "user" and msg_type == "instruction":
+            content = msg.content or ""
+            # Remove specific prefixes/markers and trim
+            for phrase in INSTRUCTION_MARKERS:
+                content = content.replace(phrase, "")
+            content = content.strip()
+
+            return {
+                "id": msg.id,
+                "role": msg.role,
+                "content": content,
+            }
+
+        if role == "user" and msg_type == "tool_result":
+            if isinstance(msg, UserMessage):
+                output_dict = {
+                    "text": [msg.content],
+                    "image": [f"{OUTPUT_URL_PREFIX}{img}" for img in msg.image] if msg.image else [],
+                }
+
+                return {
+                    "id": msg.id,
+                    "role": "function",
+                    "belongsTo": self.last_id or "",
+                    "output": json.dumps(output_dict)
+                }
+            return None
+
+        if role == "assistant" and msg_type == "tool_call":
+            action = parse_action(msg.content) or {}
+            if action.get("action") == "task_fulfill":
+                return None
+            action_name = action.get("action", "execute_code")
+            parameters = action.get("parameters", {}) or {}
+            # Choose content based on action type
+            if action_name == "execute_code":
+                selected_content = parameters.get("code", "")
+            elif action_name == "execute_sql_query":
+                selected_content = parameters.get("sql_query", "")
+            elif action_name == "export_as_csv":
+                selected_content = parameters.get("sql_query", "")
+            else:
+                # Fallback to code, then sql_query
+                selected_content = parameters.get("code", "") or parameters.get("sql_query", "")
+            return {
+                "id": msg.id,
+                "role": msg.role,
+                "function_call": {
+                    "name": action_name,
+                    "content": selected_content,
+                    "explaination": action.get("explaination", ""),
+                },
+            }
+
+        if role == "assistant" and msg_type == "final_answer":
+            return {
+                "id": msg.id,
+                "role": msg.role,
+                "content": msg.content,
+            }
+
+        return None
+
+def process_history(history: List[dict[str, Any]] | None) -> List[dict[str, Any]]:
+    return HistoryProjector().feed(history)
@@ -1,15 +1,59 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId 
+from bson.errors import InvalidId
 from datetime import datetime
+import base64
+import json
 from typing import List, Optional, Any, Dict
 from cognitus_ai.database import db
 from cognitus_ai.utils.nanoid import generate_id
-from .schemas import Chat, ChatCreate, ChatUpdate
+from .history import HistoryProjector, process_history
+from .schemas import Chat, ChatCreate, ChatSummary, ChatSummaryPage, ChatUpdate
+
+# Chats keep the raw agent `history` next to its frontend-facing projection in
+# `processed_history`; `processed_count` is how many raw messages the projection
+# covers, so appends made without projecting (e.g. straight from the agent)
+# are detected on read and caught up incrementally.
+HISTORY_COUNT = {"$size": {"$ifNull": ["$history", []]}}
+
+VIEW_PROJECTION = {
+    "title": 1,
+    "user_id": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "file_map": 1,
+    "processed_history": 1,
+    "processed_count": 1,
+    "history_count": HISTORY_COUNT,
+}
+
+TAIL_PROJECTION = {
+    "processed_history": {"$slice": -1},
+    "processed_count": 1,
+    "history_count": HISTORY_COUNT,
+}
+
+SUMMARY_PROJECTION = {"title": 1, "created_at": 1, "updated_at": 1}
+
+def _encode_cursor(updated_at: datetime, chat_id: ObjectId) -> str:
+    raw = json.dumps([updated_at.isoformat(), str(chat_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        updated_at, chat_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(updated_at), ObjectId(chat_id)
+    except (ValueError, TypeError, InvalidId) as e:
+        raise ValueError("Invalid cursor") from e
 
 class ChatRepository:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.collection = db["chats"]
 
+    async def ensure_indexes(self) -> None:
+        # Backs the per-user listing, sorted by recency with _id as tie-breaker
+        await self.collection.create_index([("user_id", 1), ("updated_at", -1), ("_id", -1)])
+
     async def create(self, user_id: str, instruction: str, chat: ChatCreate) -> Chat:
         chat_dict = chat.model_dump()
         chat_dict["user_id"] = user_id
@@ -36,13 +80,83 @@ class ChatRepository:
 
         seed_history= [{"id": generate_id(), "role": "user", "content": "[USER INSTRUCTION]: " + instruction, "type": "instruction"}]
         chat_dict["history"] = seed_history
+        chat_dict["processed_history"] = process_history(seed_history)
+        chat_dict["processed_count"] = len(seed_history)
         chat_dict["created_at"] = datetime.utcnow()
         chat_dict["updated_at"] = datetime.utcnow()
         chat_dict["file_map"] = {}
         result = await self.collection.insert_one(chat_dict)
+        chat_dict.pop("processed_history")
+        chat_dict.pop("processed_count")
         chat_dict["id"] = chat_dict.pop("_id")
         return Chat(**chat_dict)
 
+    async def _catch_up(self, chat_dict: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Pop the projection fields off `chat_dict` and return the projected history,
+        projecting (and persisting) any raw messages it does not cover yet."""
+        processed = chat_dict.pop("processed_history", None) or []
+        stored_count = chat_dict.pop("processed_count", None)
+        history_count = chat_dict.pop("history_count", 0)
+
+        processed_count = stored_count or 0
+        if processed_count > history_count:
+            processed, processed_count = [], 0
+        if processed_count == history_count:
+            return processed
+
+        tail_dict = await self.collection.find_one(
+            {"_id": chat_dict["_id"]},
+            {"history": {"$slice": [processed_count, history_count - processed_count]}, "processed_count": 1}
+        )
+        if not tail_dict:
+            return processed
+
+        projector = HistoryProjector(processed[-1]["id"] if processed else None)
+        new_items = projector.feed(tail_dict.get("history"))
+        if processed_count == 0:
+            update: Dict[str, Any] = {"$set": {"processed_history": new_items, "processed_count": history_count}}
+        else:
+            update = {
+                "$push": {"processed_history": {"$each": new_items}},
+                "$set": {"processed_count": history_count},
+            }
+        # Guarded on the count we read, so a concurrent catch-up or append wins cleanly
+        await self.collection.update_one({"_id": chat_dict["_id"], "processed_count": stored_count}, update)
+        return processed + new_items
+
+    async def _to_view(self, chat_dict: Dict[str, Any]) -> Chat:
+        chat_dict["history"] = await self._catch_up(chat_dict)
+        chat_dict["id"] = chat_dict.pop("_id")
+        return Chat(**chat_dict)
+
+    async def get_view(self, chat_id: str, user_id: str) -> Optional[Chat]:
+        """Like get_by_id, but with `history` holding the projected view."""
+        if not ObjectId.is_valid(chat_id):
+            return None
+
+        chat_dict = await self.collection.find_one(
+            {"_id": ObjectId(chat_id), "user_id": user_id},
+            VIEW_PROJECTION
+        )
+
+        if chat_dict:
+            return await self._to_view(chat_dict)
+        return None
+
+    async def get_view_tail(self, chat_id: str, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Return the last projected history item (an empty list if there is none yet)."""
+        if not ObjectId.is_valid(chat_id):
+            return None
+
+        chat_dict = await self.collection.find_one(
+            {"_id": ObjectId(chat_id), "user_id": user_id},
+            TAIL_PROJECTION
+        )
+
+        if chat_dict:
+            return (await self._catch_up(chat_dict))[-1:]
+        return None
+
     async def get_by_id(self, chat_id: str, user_id: str) -> Optional[Chat]:
         if not ObjectId.is_valid(chat_id):
             return None
@@ -58,11 +172,38 @@ class ChatRepository:
         return None
 
     async def list_by_user(self, user_id: str) -> List[Chat]:
-        cursor = self.collection.find({"user_id": user_id}).sort("updated_at", -1)
+        cursor = self.collection.find({"user_id": user_id}, VIEW_PROJECTION).sort("updated_at", -1)
         chats_dicts = await cursor.to_list(length=100)
+        return [await self._to_view(chat) for chat in chats_dicts]
+
+    async def list_summaries_by_user(self, user_id: str, limit: int, cursor: Optional[str] = None) -> ChatSummaryPage:
+        """Keyset-paginated listing of id, title and timestamps, newest first.
+
+        Raises ValueError for a malformed cursor.
+        """
+        query: Dict[str, Any] = {"user_id": user_id}
+        if cursor:
+            updated_at, last_id = _decode_cursor(cursor)
+            query["$or"] = [
+                {"updated_at": {"$lt": updated_at}},
+                {"updated_at": updated_at, "_id": {"$lt": last_id}},
+            ]
+
+        mongo_cursor = (
+            self.collection.find(query, SUMMARY_PROJECTION)
+            .sort([("updated_at", -1), ("_id", -1)])
+            .limit(limit + 1)
+        )
+        chats_dicts = await mongo_cursor.to_list(length=limit + 1)
+
+        next_cursor = None
+        if len(chats_dicts) > limit:
+            chats_dicts = chats_dicts[:limit]
+            next_cursor = _encode_cursor(chats_dicts[-1]["updated_at"], chats_dicts[-1]["_id"])
+
         for chat in chats_dicts:
             chat["id"] = chat.pop("_id")
-        return [Chat(**chat) for chat in chats_dicts]
+        return ChatSummaryPage(items=[ChatSummary(**chat) for chat in chats_dicts], next_cursor=next_cursor)
 
     async def update(self, chat_id: str, user_id: str, chat_update: ChatUpdate) -> Optional[Chat]:
         if not ObjectId.is_valid(chat_id):
@@ -74,32 +215,89 @@ class ChatRepository:
         chat_dict = await self.collection.find_one_and_update(
             {"_id": ObjectId(chat_id), "user_id": user_id},
             {"$set": update_data},
+            projection=VIEW_PROJECTION,
             return_document=True
         )
         
         if chat_dict:
-            chat_dict["id"] = chat_dict.pop("_id")
-            return Chat(**chat_dict)
+            return await self._to_view(chat_dict)
         return None
 
     async def add_message(self, chat_id: str, user_id: str, message: Dict[str, Any]) -> Optional[Chat]:
+        return await self.append_history(chat_id, [message], user_id)
+
+    async def append_history(
+        self, chat_id: str, messages: List[Dict[str, Any]], user_id: Optional[str] = None
+    ) -> Optional[Chat]:
+        """Append raw messages and their projection in one write.
+
+        This is the write path for anything that extends a chat's history, including
+        the agent's stream writer (which passes no `user_id`).
+        """
         if not ObjectId.is_valid(chat_id):
             return None
-            
-        chat_dict = await self.collection.find_one_and_update(
-            {"_id": ObjectId(chat_id), "user_id": user_id},
-            {
-                "$push": {"history": message},
-                "$set": {"updated_at": datetime.utcnow()}
-            },
-            return_document=True
-        )
-        
+
+        query: Dict[str, Any] = {"_id": ObjectId(chat_id)}
+        if user_id is not None:
+            query["user_id"] = user_id
+
+        tail_dict = await self.collection.find_one(query, TAIL_PROJECTION)
+        if not tail_dict:
+            return None
+
+        raw_update: Dict[str, Any] = {
+            "$push": {"history": {"$each": messages}},
+            "$set": {"updated_at": datetime.utcnow()}
+        }
+        chat_dict = None
+
+        processed_count = tail_dict.get("processed_count")
+        if processed_count is not None and processed_count == tail_dict["history_count"]:
+            last = tail_dict.get("processed_history") or []
+            projector = HistoryProjector(last[-1]["id"] if last else None)
+            chat_dict = await self.collection.find_one_and_update(
+                {**query, "processed_count": processed_count},
+                {
+                    "$push": {
+                        "history": {"$each": messages},
+                        "processed_history": {"$each": projector.feed(messages)},
+                    },
+                    "$set": {"updated_at": datetime.utcnow()},
+                    "$inc": {"processed_count": len(messages)},
+                },
+                projection={"processed_history": 0, "processed_count": 0},
+                return_document=True
+            )
+
+        if not chat_dict:
+            # Projection is behind (or raced); the next read catches it up
+            chat_dict = await self.collection.find_one_and_update(
+                query,
+                raw_update,
+                projection={"processed_history": 0, "processed_count": 0},
+                return_document=True
+            )
+
         if chat_dict:
             chat_dict["id"] = chat_dict.pop("_id")
             return Chat(**chat_dict)
         return None
 
+    async def backfill_processed_history(self) -> int:
+        """Rebuild the stored projection of every chat whose projection is missing or stale."""
+        stale = {"$expr": {"$ne": [{"$ifNull": ["$processed_count", -1]}, HISTORY_COUNT]}}
+        cursor = self.collection.find(stale, {"history": 1, "processed_count": 1})
+
+        updated = 0
+        async for chat_dict in cursor:
+            history = chat_dict.get("history") or []
+            result = await self.collection.update_one(
+                {"_id": chat_dict["_id"], "processed_count": chat_dict.get("processed_count")},
+                {"$set": {"processed_history": process_history(history), "processed_count": len(history)}}
+            )
+            updated += result.modified_count
+        return updated
+
     async def delete(self, chat_id: str, user_id: str) -> bool:
         if not ObjectId.is_valid(chat_id):
             return False
@@ -110,6 +308,16 @@ class ChatRepository:
         })
         return result.deleted_count > 0
     
+    async def get_history_ids(self, chat_id: str) -> Optional[set[str]]:
+        """Ids of the raw history messages already stored for a chat."""
+        if not ObjectId.is_valid(chat_id):
+            return None
+
+        chat_dict = await self.collection.find_one({"_id": ObjectId(chat_id)}, {"history.id": 1})
+        if chat_dict:
+            return {msg.get("id") for msg in chat_dict.get("history", [])}
+        return None
+
     async def get_file_map(self, chat_id: str, user_id: str) -> Optional[Dict[str, str]]:
         if not ObjectId.is_valid(chat_id):
             return None
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, Optional
+
+from redis.asyncio import Redis
+
+from cognitus_ai.config import RetentionSettings, config
+from cognitus_ai.database import redis_client
+from cognitus_ai.utils.logging import logger
+from .repository import chat_repository
+from .streams import stream_id_tuple
+
+STATUS_KEY_PATTERN = "stream:*:status"
+LOCK_KEY = "stream-retention:lock"
+
+# Drop (or expire) both streams of a chat and their trim watermarks, unless a new
+# status entry arrived since we looked. Expiring streams are marked as compacted
+# (KEYS[5]) up to that status entry, so later passes leave them alone.
+COMPACT_SCRIPT = """
+local last = redis.call('XREVRANGE', KEYS[1], '+', '-', 'COUNT', 1)
+if #last == 0 or last[1][1] ~= ARGV[1] then
+    return 0
+end
+if tonumber(ARGV[2]) > 0 then
+    for i = 1, 4 do
+        redis.call('EXPIRE', KEYS[i], ARGV[2])
+    end
+    redis.call('SET', KEYS[5], ARGV[1], 'EX', ARGV[2])
+else
+    redis.call('DEL', KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5])
+end
+return 1
+"""
+
+# Trimming is exact and records the newest removed entry id in KEYS[2], so
+# `has_gap` can tell whether anything after a client's position is gone.
+# XADD, then trim to ARGV[2] entries. ARGV: payload, max length
+APPEND_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], '*', 'data', ARGV[1])
+local excess = redis.call('XLEN', KEYS[1]) - tonumber(ARGV[2])
+if excess > 0 then
+    local dropped = redis.call('XRANGE', KEYS[1], '-', '+', 'COUNT', excess)
+    redis.call('XTRIM', KEYS[1], 'MAXLEN', ARGV[2])
+    redis.call('SET', KEYS[2], dropped[#dropped][1])
+end
+return id
+"""
+
+# Remove entries older than ARGV[1] (ms); ARGV[2] is ARGV[1] - 1
+TRIM_SCRIPT = """
+local dropped = redis.call('XREVRANGE', KEYS[1], ARGV[2], '-', 'COUNT', 1)
+if #dropped == 0 then
+    return 0
+end
+local trimmed = redis.call('XTRIM', KEYS[1], 'MINID', ARGV[1])
+redis.call('SET', KEYS[2], dropped[1][1])
+return trimmed
+"""
+
+
+def watermark_key(key: str) -> str:
+    return f"{key}:trimmed"
+
+
+class StreamRetention:
+    """Keeps the agent's per-chat Redis streams bounded.
+
+    Writers go through `append`, which caps each stream at MAXLEN entries. A
+    background compactor periodically trims entries older than the retention
+    window with MINID, and for runs that finished more than `compact_after_seconds`
+    ago copies any history the chat document is missing into Mongo, then deletes
+    (or expires) both stream keys. Only one worker compacts at a time.
+    """
+
+    def __init__(self, redis: Redis, settings: RetentionSettings):
+        self.redis = redis
+        self.settings = settings
+        self._task: Optional[asyncio.Task] = None
+        self._compact_script = self.redis.register_script(COMPACT_SCRIPT)
+        self._append_script = self.redis.register_script(APPEND_SCRIPT)
+        self._trim_script = self.redis.register_script(TRIM_SCRIPT)
+        self.passes_total = 0
+        self.compacted_chats_total = 0
+        self.moved_messages_total = 0
+        self.trimmed_entries_total = 0
+        self.reclaimed_bytes_total = 0
+
+    async def append(self, key: str, data: Dict[str, Any]) -> str:
+        """XADD a JSON payload, trimming the stream to `max_len` entries."""
+        return await self._append_script(
+            keys=[key, watermark_key(key)], args=[json.dumps(data), self.settings.max_len]
+        )
+
+    async def trim(self, key: str, min_id: int) -> int:
+        """Remove entries older than `min_id` (ms), recording what was removed."""
+        return await self._trim_script(keys=[key, watermark_key(key)], args=[min_id, min_id - 1])
+
+    async def has_gap(self, key: str, after_id: str) -> bool:
+        """Whether entries after `after_id` have been trimmed or compacted away.
+
+        Compares against the newest entry our trimming removed, so a stream whose
+        head was trimmed only up to (or before) the client's position is no gap.
+        Only trimming done through `append` and `trim` is seen.
+        """
+        if stream_id_tuple(after_id) == (0, 0):
+            return False
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.exists(key)
+            pipe.get(watermark_key(key))
+            exists, trimmed_to = await pipe.execute()
+        if not exists:
+            # Compacted into Mongo and dropped
+            return True
+        return trimmed_to is not None and stream_id_tuple(trimmed_to) > stream_id_tuple(after_id)
+
+    async def _memory_usage(self, *keys: str) -> int:
+        total = 0
+        for key in keys:
+            try:
+                total += await self.redis.memory_usage(key) or 0
+            except Exception:
+                # MEMORY USAGE can be disabled (e.g. renamed on managed Redis)
+                return 0
+        return total
+
+    async def compact_chat(self, chat_id: str) -> bool:
+        """Move a finished run's history into Mongo and drop its streams.
+
+        Returns False if the chat is still running, not old enough, or changed while
+        being compacted, and True if it is (or already was) compacted.
+        """
+        history_key = f"stream:{chat_id}:history"
+        status_key = f"stream:{chat_id}:status"
+        compacted_key = f"stream:{chat_id}:compacted"
+
+        last_status = await self.redis.xrevrange(status_key, count=1)
+        if not last_status:
+            return False
+        status_id, status_payload = last_status[0]
+        if await self.redis.get(compacted_key) == status_id:
+            # Expiring since an earlier pass; nothing new to move
+            return True
+        try:
+            flag = json.loads(status_payload.get("data") or "{}").get("flag")
+        except Exception:
+            flag = None
+        age_ms = time.time() * 1000 - stream_id_tuple(status_id)[0]
+        if flag != "flow_finished" or age_ms < self.settings.compact_after_seconds * 1000:
+            return False
+
+        known_ids = await chat_repository.get_history_ids(chat_id)
+        if known_ids is not None:
+            missing = []
+            for _, payload in await self.redis.xrange(history_key):
+                try:
+                    message = json.loads(payload.get("data") or "")
+                except Exception:
+                    continue
+                if isinstance(message, dict) and message.get("id") not in known_ids:
+                    missing.append(message)
+            if missing:
+                await chat_repository.append_history(chat_id, missing)
+                self.moved_messages_total += len(missing)
+
+        reclaimable = await self._memory_usage(history_key, status_key)
+        compacted = await self._compact_script(
+            keys=[status_key, history_key, watermark_key(status_key), watermark_key(history_key), compacted_key],
+            args=[status_id, self.settings.compacted_ttl_seconds],
+        )
+        if compacted:
+            self.compacted_chats_total += 1
+            self.reclaimed_bytes_total += reclaimable
+        return bool(compacted)
+
+    async def run_once(self) -> None:
+        if not await self.redis.set(LOCK_KEY, "1", nx=True, ex=max(1, int(self.settings.interval_seconds))):
+            return
+
+        self.passes_total += 1
+        min_id = int((time.time() - self.settings.retention_seconds) * 1000)
+        async for status_key in self.redis.scan_iter(match=STATUS_KEY_PATTERN, count=500):
+            chat_id = status_key.split(":")[1]
+            try:
+                if await self.compact_chat(chat_id):
+                    continue
+                for key in (status_key, f"stream:{chat_id}:history"):
+                    before = await self._memory_usage(key)
+                    trimmed = await self.trim(key, min_id)
+                    if trimmed:
+                        self.trimmed_entries_total += trimmed
+                        self.reclaimed_bytes_total += max(0, before - await self._memory_usage(key))
+            except Exception as e:
+                logger.warning(f"Stream retention failed for chat {chat_id}: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stream retention pass failed: {e}")
+            await asyncio.sleep(self.settings.interval_seconds)
+
+    async def start(self) -> None:
+        if self.settings.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "passes_total": self.passes_total,
+            "compacted_chats_total": self.compacted_chats_total,
+            "moved_messages_total": self.moved_messages_total,
+            "trimmed_entries_total": self.trimmed_entries_total,
+            "reclaimed_bytes_total": self.reclaimed_bytes_total,
+        }
+
+
+stream_retention = StreamRetention(redis_client, config.retention)
@@ -1,18 +1,22 @@
-import json
-from typing import List, Annotated, Any
+import asyncio
+from typing import List, Annotated
 import httpx
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status, Request
 from fastapi.responses import StreamingResponse
 
-from cognitus_ai.utils.parse_action import parse_action
+from cognitus_ai.config import config
+from cognitus_ai.utils import fastjson
 from cognitus_ai.utils.nanoid import generate_id
-from .schemas import AssistantMessage, Chat, ChatCreate, ChatUpdate, SystemMessage, UserMessage
+from cognitus_ai.utils.logging import logger
+from .history import HistoryProjector
+from .schemas import Chat, ChatCreate, ChatSummaryPage, ChatUpdate
 from .repository import chat_repository
 from .service import forward_request_to_agent
+from .streams import StreamEntry, decode_stream_cursor, encode_stream_cursor, stream_multiplexer
+from .retention import stream_retention
 from ..auth.dependencies import get_current_user
 from ..auth.schemas import User
-from ..database import redis_client
 
 router = APIRouter(prefix="/chats", tags=["chats"])
 
@@ -20,92 +24,6 @@ class ChatInstruction(BaseModel):
     user_instruction: str
     database_name: str | None = None
 
-def _process_history(history: List[dict[str, Any]]) -> List[dict[str, Any]]:
-    processed: List[dict[str, Any]] = []
-    
-    for msg_dict in history or []:
-        role = msg_dict.get("role")
-        msg_type = msg_dict.get("type")
-
-        try:
-            if role == "user":
-                msg = UserMessage(**msg_dict)
-            elif role == "assistant":
-                msg = AssistantMessage(**msg_dict)
-            elif role == "system":
-                msg = SystemMessage(**msg_dict)
-            else:
-                continue
-        except Exception:
-            continue
-
-        if role == "user" and msg_type == "instruction":
-            content = msg.content or ""
-            # Remove specific prefixes/markers and trim
-            for phrase in [
-                "[USER INSTRUCTION]:",
-                "[THIS IS AN OLD INSTRUCTION, NOT THE LATEST ONE]",
-            ]:
-                content = content.replace(phrase, "")
-            content = content.strip()
-
-            processed.append({
-                "id": msg.id,
-                "role": msg.role,
-                "content": content,
-            })
-
-        elif role == "user" and msg_type == "tool_result":
-            if isinstance(msg, UserMessage):
-                belongs_to = processed[-1]["id"] if processed else ""
-                url_prefix = "http://localhost:9090/output/"
-                output_dict = {
-                    "text": [msg.content],
-                    "image": [f"{url_prefix}{img}" for img in msg.image] if msg.image else [],
-                }
-                
-                processed.append({
-                    "id": msg.id,
-                    "role": "function",
-                    "belongsTo": belongs_to,
-                    "output": json.dumps(output_dict)
-                })
-
-        elif role == "assistant" and msg_type == "tool_call":
-            action = parse_action(msg.content) or {}
-            if action.get("action") == "task_fulfill":
-                continue
-            action_name = action.get("action", "execute_code")
-            parameters = action.get("parameters", {}) or {}
-            # Choose content based on action type
-            if action_name == "execute_code":
-                selected_content = parameters.get("code", "")
-            elif action_name == "execute_sql_query":
-                selected_content = parameters.get("sql_query", "")
-            elif action_name == "export_as_csv":
-                selected_content = parameters.get("sql_query", "")
-            else:
-                # Fallback to code, then sql_query
-                selected_content = parameters.get("code", "") or parameters.get("sql_query", "")
-            processed.append({
-                "id": msg.id,
-                "role": msg.role,
-                "function_call": {
-                    "name": action_name,
-                    "content": selected_content,
-                    "explaination": action.get("explaination", ""),
-                },
-            })
-
-        elif role == "assistant" and msg_type == "final_answer":
-            processed.append({
-                "id": msg.id,
-                "role": msg.role,
-                "content": msg.content,
-            })
-
-    return processed
-
 @router.post("/", response_model=Chat, status_code=status.HTTP_201_CREATED)
 async def create_chat(
     chat_in: ChatCreate,
@@ -124,31 +42,32 @@ async def create_chat(
 
     return chat
 
-@router.get("/", response_model=List[Chat])
+@router.get("/", response_model=List[Chat] | ChatSummaryPage)
 async def list_chats(
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(get_current_user)],
+    summary: bool = False,
+    limit: Annotated[int, Query(ge=1, le=100)] = 50,
+    cursor: str | None = None,
 ):
-    chats = await chat_repository.list_by_user(current_user.email)
-    result: List[Chat] = []
-    for chat in chats:
-        chat_dict = chat.model_dump()
-        chat_dict["history"] = _process_history(chat.history)
-        result.append(Chat(**chat_dict))
-    return result
+    # summary=true returns a page of id/title/timestamps for the sidebar
+    if not summary:
+        return await chat_repository.list_by_user(current_user.email)
+
+    try:
+        return await chat_repository.list_summaries_by_user(current_user.email, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.get("/{chat_id}", response_model=Chat)
 async def get_chat(
     chat_id: str,
     current_user: Annotated[User, Depends(get_current_user)]
 ):
-    chat = await chat_repository.get_by_id(chat_id, current_user.email)
+    chat = await chat_repository.get_view(chat_id, current_user.email)
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     
-    chat_dict = chat.model_dump()
-    chat_dict["history"] = _process_history(chat.history)
-    
-    return Chat(**chat_dict)
+    return chat
 
 @router.post("/{chat_id}/agent", status_code=status.HTTP_200_OK)
 async def forward_to_local_agent(
@@ -187,68 +106,121 @@ async def forward_to_local_agent(
 async def stream_chat_history_sse(
     chat_id: str,
     request: Request,
-    current_user: Annotated[User, Depends(get_current_user)]
+    current_user: Annotated[User, Depends(get_current_user)],
+    last_event_id: Annotated[str | None, Header()] = None,
 ):
-    chat = await chat_repository.get_by_id(chat_id, current_user.email)
-    if not chat:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
-
     history_key = f"stream:{chat_id}:history"
     status_key = f"stream:{chat_id}:status"
-    
-    # We track last IDs for both streams
+    cursor_scope = f"{current_user.email}:{chat_id}"
+
+    # A cursor we issued carries both stream positions and the projector state,
+    # so a reconnect resumes without touching Mongo
+    resume = decode_stream_cursor(cursor_scope, last_event_id) if last_event_id else None
+    missed: List[dict] = []
+    if resume:
+        history_id, status_id, last_item_id = resume
+        if await stream_retention.has_gap(history_key, history_id):
+            # Part of the run was trimmed or compacted into Mongo since the client left
+            chat = await chat_repository.get_view(chat_id, current_user.email)
+            if chat is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
+            seen = [item["id"] for item in chat.history]
+            if last_item_id is None:
+                missed = chat.history
+            elif last_item_id in seen:
+                missed = chat.history[seen.index(last_item_id) + 1:]
+            else:
+                # The client is ahead of what Mongo has; replaying the whole chat
+                # would only duplicate it, so carry on from the stream
+                logger.warning(f"Chat {chat_id}: resumed item {last_item_id} is not in the stored history")
+            if missed:
+                last_item_id = missed[-1]["id"]
+    else:
+        view_tail = await chat_repository.get_view_tail(chat_id, current_user.email)
+        if view_tail is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
+        # Both streams are read from the start
+        history_id, status_id = "0", "0"
+        last_item_id = view_tail[-1]["id"] if view_tail else None
+
     last_ids = {
-        history_key: "0",
-        status_key: "0"
+        history_key: history_id,
+        status_key: status_id
     }
 
-    history_buffer: List[dict[str, Any]] = list(chat.history or [])
-    processed_len: int = len(_process_history(history_buffer))
-
-    async def event_generator():
-        nonlocal processed_len
-        while True:
-            if await request.is_disconnected():
-                break
-
-            try:
-                # Read from both streams
-                events = await redis_client.xread(last_ids, block=2000) # type: ignore
-            except Exception as e:
-                yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
-                break
-
-            if not events:
-                continue
+    # Only the newly appended messages are projected per event
+    projector = HistoryProjector(last_item_id)
 
-            for stream_name, messages in events:
-                for msg_id, payload in messages:
-                    raw_json = payload.get("data")
-                    if not raw_json:
-                        continue
-                    
-                    try:
-                        data_dict = json.loads(raw_json)
-                    except Exception:
-                        continue
-
-                    # Handle History Stream
-                    if stream_name == history_key:
-                        history_buffer.append(data_dict)
-                        processed_now = _process_history(history_buffer)
-                        new_items = processed_now[processed_len:]
+    def render(entry: StreamEntry) -> List[str]:
+        stream_name, msg_id, payload = entry
+        last_ids[stream_name] = msg_id
+        raw_json = payload.get("data")
+        if not raw_json:
+            return []
+        
+        try:
+            data_dict = fastjson.loads(raw_json)
+        except Exception:
+            return []
+
+        frames: List[str] = []
+        # Handle History Stream
+        if stream_name == history_key:
+            for item in projector.feed([data_dict]):
+                event_id = encode_stream_cursor(cursor_scope, last_ids[history_key], last_ids[status_key], projector.last_id)
+                frames.append(f"id: {event_id}\nevent: message\ndata: {fastjson.dumps(item)}\n\n")
+        
+        # Handle Status Stream
+        elif stream_name == status_key:
+            event_id = encode_stream_cursor(cursor_scope, last_ids[history_key], last_ids[status_key], projector.last_id)
+            frames.append(f"id: {event_id}\nevent: status\ndata: {fastjson.dumps(data_dict)}\n\n")
+        return frames
 
-                        for item in new_items:
-                            yield f"id: {msg_id}\nevent: message\ndata: {json.dumps(item)}\n\n"
-                        
-                        processed_len = len(processed_now)
-                    
-                    # Handle Status Stream
-                    elif stream_name == status_key:
-                        yield f"id: {msg_id}\nevent: status\ndata: {json.dumps(data_dict)}\n\n"
+    coalesce_window = config.stream.coalesce_ms / 1000
+    coalesce_max_bytes = config.stream.coalesce_max_bytes
 
-                    # Update the last ID for this specific stream
-                    last_ids[stream_name] = msg_id
+    async def event_generator():
+        for item in missed:
+            event_id = encode_stream_cursor(cursor_scope, last_ids[history_key], last_ids[status_key], projector.last_id)
+            yield f"id: {event_id}\nevent: message\ndata: {fastjson.dumps(item)}\n\n"
+
+        async with stream_multiplexer.subscribe(last_ids) as subscription:
+            dropped = False
+            while not dropped:
+                if await request.is_disconnected():
+                    break
+
+                try:
+                    entry = await asyncio.wait_for(subscription.get(), timeout=2)
+                except asyncio.TimeoutError:
+                    continue
+
+                if entry is None:
+                    # Fell too far behind and was dropped; the client reconnects
+                    break
+
+                frames = render(entry)
+                if coalesce_window > 0:
+                    # Keep collecting for the flush window so bursts go out as one write
+                    size = sum(len(frame) for frame in frames)
+                    deadline = asyncio.get_running_loop().time() + coalesce_window
+                    while size < coalesce_max_bytes:
+                        remaining = deadline - asyncio.get_running_loop().time()
+                        if remaining <= 0:
+                            break
+                        try:
+                            entry = await asyncio.wait_for(subscription.get(), timeout=remaining)
+                        except asyncio.TimeoutError:
+                            break
+                        if entry is None:
+                            dropped = True
+                            break
+                        new_frames = render(entry)
+                        frames.extend(new_frames)
+                        size += sum(len(frame) for frame in new_frames)
+
+                if frames:
+                    yield "".join(frames)
 
     headers = {
         "Cache-Control": "no-cache",
@@ -81,3 +81,12 @@ class Chat(ChatBase):
         populate_by_name = True
         json_encoders = {ObjectId: str}
         arbitrary_types_allowed = True
+
+class ChatSummary(ChatBase):
+    id: PyObjectId = Field(default_factory=PyObjectId)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ChatSummaryPage(BaseModel):
+    items: List[ChatSummary] = []
+    next_cursor: Optional[str] = None
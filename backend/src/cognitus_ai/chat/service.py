@@ -1,12 +1,104 @@
 import httpx
 from typing import Any, Dict
 
+from cognitus_ai.config import AgentSettings, config
+from cognitus_ai.utils.logging import logger
+from .dispatcher import AgentDispatcher
 
-AGENT_CHAT_URL = "http://localhost:9090/chat"
+
+class AgentClient:
+    """Application-scoped, pooled HTTP client for talking to the agent.
+
+    Started and closed by the app lifespan; connections are kept alive and reused
+    across requests instead of opening a new one per call. Requests are spread over
+    the configured agent replicas by an AgentDispatcher.
+    """
+
+    def __init__(self, settings: AgentSettings):
+        self.settings = settings
+        self._client: httpx.AsyncClient | None = None
+        self.dispatcher = AgentDispatcher(
+            settings.endpoints,
+            virtual_nodes=settings.virtual_nodes,
+            failure_threshold=settings.failure_threshold,
+            recovery_timeout=settings.recovery_timeout,
+        )
+        self.in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = self.settings.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("agent.http2 is enabled but the h2 package is not installed; falling back to HTTP/1.1")
+                http2 = False
+
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.settings.max_connections,
+                max_keepalive_connections=self.settings.max_keepalive_connections,
+                keepalive_expiry=self.settings.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                connect=self.settings.connect_timeout,
+                read=self.settings.read_timeout,
+                write=self.settings.write_timeout,
+                pool=self.settings.pool_timeout,
+            ),
+        )
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Outside the app lifespan (scripts, tests) the client is created on first use
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    async def post_json(self, path: str, session_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.in_flight += 1
+        self.requests_total += 1
+        try:
+            return await self.dispatcher.post_json(self.client, path, session_id, payload)
+        except Exception:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        # httpx does not expose pool state publicly, so read httpcore's pool defensively
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        return {
+            "in_flight": self.in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "connections": len(connections),
+            "idle_connections": sum(1 for conn in connections if conn.is_idle()),
+            "max_connections": self.settings.max_connections,
+            "max_keepalive_connections": self.settings.max_keepalive_connections,
+            "endpoints": self.dispatcher.stats(),
+        }
+
+
+agent_client = AgentClient(config.agent)
 
 
 async def forward_request_to_agent(session_id: str, user_instruction: str, database: str | None) -> Dict[str, Any]:
-    """Forward a request to the local agent and return the JSON response.
+    """Forward a request to the session's agent replica and return the JSON response.
 
     Raises httpx.HTTPStatusError for non-2xx responses and httpx.RequestError for network issues.
     """
@@ -16,7 +108,4 @@ async def forward_request_to_agent(session_id: str, user_instruction: str, datab
         "database": database
     }
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.post(AGENT_CHAT_URL, json=payload)
-        resp.raise_for_status()
-        return resp.json()
+    return await agent_client.post_json("/chat", session_id, payload)
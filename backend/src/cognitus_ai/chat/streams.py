@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import hmac
+import re
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from redis.asyncio import Redis
+
+from cognitus_ai.config import StreamSettings, config
+from cognitus_ai.database import redis_client
+from cognitus_ai.utils.logging import logger
+
+# (stream key, entry id, entry fields)
+StreamEntry = Tuple[str, str, Dict[str, Any]]
+
+
+STREAM_ID_PATTERN = re.compile(r"^\d+(-\d+)?$")
+
+
+def stream_id_tuple(entry_id: str) -> Tuple[int, int]:
+    """Redis stream entry id as a comparable (milliseconds, sequence) pair."""
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def _sign_cursor(scope: str, body: str) -> str:
+    message = f"{scope}|{body}".encode("utf-8")
+    return hmac.new(config.auth.secret_key.encode("utf-8"), message, hashlib.sha256).hexdigest()[:32]
+
+
+def encode_stream_cursor(scope: str, history_id: str, status_id: str, last_item_id: Optional[str]) -> str:
+    """Build the SSE event id: both stream positions plus the last projected item id.
+
+    The cursor is signed for `scope` (user and chat), so a client presenting it as
+    Last-Event-ID can be resumed without looking the chat up again.
+    """
+    body = f"{history_id},{status_id},{last_item_id or ''}"
+    return f"{body}.{_sign_cursor(scope, body)}"
+
+
+def decode_stream_cursor(scope: str, cursor: str) -> Optional[Tuple[str, str, Optional[str]]]:
+    """Inverse of encode_stream_cursor; None if the cursor is malformed or not signed for `scope`."""
+    body, _, signature = cursor.strip().rpartition(".")
+    # Header values can carry any latin-1 text; compare bytes so that is a mismatch, not an error
+    if not hmac.compare_digest(signature.encode("utf-8"), _sign_cursor(scope, body).encode("utf-8")):
+        return None
+    parts = body.split(",", 2)
+    if len(parts) != 3 or not all(STREAM_ID_PATTERN.match(part) for part in parts[:2]):
+        return None
+    history_id, status_id, last_item_id = parts
+    return history_id, status_id, last_item_id or None
+
+
+class StreamSubscription:
+    """One subscriber's view of a set of Redis streams.
+
+    Entries arrive in stream order per key, each at most once. If the subscriber
+    falls `max_queue` entries behind it is dropped: its queue is emptied and `get`
+    returns None, so the connection can close and the client resume later.
+    """
+
+    def __init__(self, last_ids: Dict[str, str], max_queue: int):
+        self.last_ids = dict(last_ids)
+        self.queue: asyncio.Queue[Optional[StreamEntry]] = asyncio.Queue(maxsize=max_queue)
+        self.overflowed = False
+        # Live entries received while the backlog is still being read; None once live
+        self._pending: Optional[List[StreamEntry]] = []
+        self._catch_up_task: Optional[asyncio.Task] = None
+
+    def _deliver(self, entry: StreamEntry) -> bool:
+        if self.overflowed:
+            return False
+        if self._pending is not None:
+            self._pending.append(entry)
+            if len(self._pending) > self.queue.maxsize:
+                self._overflow()
+            return True
+
+        key, entry_id, _ = entry
+        if stream_id_tuple(entry_id) <= stream_id_tuple(self.last_ids[key]):
+            return True
+        try:
+            self.queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self._overflow()
+            return False
+        self.last_ids[key] = entry_id
+        return True
+
+    def _overflow(self) -> None:
+        self.overflowed = True
+        self._pending = None
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+    def _go_live(self) -> None:
+        pending, self._pending = self._pending, None
+        for entry in pending or []:
+            if not self._deliver(entry):
+                break
+
+    async def get(self) -> Optional[StreamEntry]:
+        """Next entry, or None once the subscriber has been dropped for falling behind."""
+        return await self.queue.get()
+
+
+class StreamMultiplexer:
+    """Fans Redis stream entries out to in-process subscribers.
+
+    A single background task runs one blocking XREAD over every stream that has a
+    subscriber in this process, instead of one XREAD loop per open connection. A
+    new subscriber first reads its own backlog with XRANGE and then switches to
+    the shared feed. Streams subscribed while an XREAD is blocked are picked up
+    when it returns, after at most `block_ms`.
+    """
+
+    def __init__(self, redis: Redis, settings: StreamSettings):
+        self.redis = redis
+        self.settings = settings
+        self._subscribers: Dict[str, Set[StreamSubscription]] = {}
+        self._positions: Dict[str, str] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.entries_total = 0
+        self.dropped_total = 0
+
+    @asynccontextmanager
+    async def subscribe(self, last_ids: Dict[str, str]) -> AsyncIterator[StreamSubscription]:
+        """Subscribe to the given streams, starting after the given entry ids."""
+        subscription = StreamSubscription(last_ids, self.settings.max_queue)
+        new_keys = [key for key in last_ids if key not in self._subscribers]
+        for key in last_ids:
+            self._subscribers.setdefault(key, set()).add(subscription)
+
+        try:
+            for key in new_keys:
+                # The shared feed starts at the stream's current tail; older entries come from the backlog read
+                latest = await self.redis.xrevrange(key, count=1)
+                if key in self._subscribers:
+                    self._positions.setdefault(key, latest[0][0] if latest else "0-0")
+            self._wakeup.set()
+            if self._task is None or self._task.done():
+                self._task = asyncio.create_task(self._run())
+
+            subscription._catch_up_task = asyncio.create_task(self._catch_up(subscription))
+            yield subscription
+        finally:
+            if subscription._catch_up_task is not None:
+                subscription._catch_up_task.cancel()
+            if subscription.overflowed:
+                self.dropped_total += 1
+            for key in last_ids:
+                subscribers = self._subscribers.get(key)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[key]
+                    self._positions.pop(key, None)
+
+    async def _catch_up(self, subscription: StreamSubscription) -> None:
+        try:
+            for key in list(subscription.last_ids):
+                while not subscription.overflowed:
+                    last_id = subscription.last_ids[key]
+                    start = "-" if stream_id_tuple(last_id) == (0, 0) else f"({last_id}"
+                    entries = await self.redis.xrange(key, min=start, max="+", count=self.settings.batch_size)
+                    for entry_id, fields in entries:
+                        if subscription.overflowed:
+                            break
+                        # Blocks while the queue is full, which throttles the backlog read
+                        await subscription.queue.put((key, entry_id, fields))
+                        subscription.last_ids[key] = entry_id
+                    if len(entries) < self.settings.batch_size:
+                        break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to read stream backlog: {e}")
+        subscription._go_live()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._positions:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            try:
+                events = await self.redis.xread(
+                    dict(self._positions), block=self.settings.block_ms, count=self.settings.batch_size
+                )  # type: ignore
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stream multiplexer XREAD failed: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for stream_name, messages in events or []:
+                if stream_name not in self._positions:
+                    continue
+                for msg_id, payload in messages:
+                    self.entries_total += 1
+                    for subscription in list(self._subscribers.get(stream_name, ())):
+                        subscription._deliver((stream_name, msg_id, payload))
+                    self._positions[stream_name] = msg_id
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        subscriptions = {sub for subs in self._subscribers.values() for sub in subs}
+        return {
+            "streams": len(self._positions),
+            "subscribers": len(subscriptions),
+            "queued_entries": sum(sub.queue.qsize() for sub in subscriptions),
+            "entries_total": self.entries_total,
+            "dropped_total": self.dropped_total,
+        }
+
+
+stream_multiplexer = StreamMultiplexer(redis_client, config.stream)
@@ -1,9 +1,10 @@
 import os
 import yaml
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field, ConfigDict
 from string import Template
 from dotenv import load_dotenv
+from .utils.startup import startup_timer
 
 load_dotenv()
 
@@ -28,6 +29,87 @@ class AuthSettings(BaseModel):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
+    # PEM key files for asymmetric algorithms (RS256, ES256, ...); require pyjwt[crypto]
+    private_key_file: Optional[str] = None
+    public_key_file: Optional[str] = None
+    # Verified-token cache; 0 disables it
+    token_cache_size: int = 10000
+    # Authenticated-user cache; a TTL of 0 disables it
+    user_cache_ttl_seconds: float = 60.0
+    user_cache_size: int = 10000
+    user_cache_redis: bool = False
+    # bcrypt work factor for new hashes; existing hashes keep the cost they were made with
+    bcrypt_rounds: int = 12
+    password_workers: int = 2
+    password_queue_size: int = 32
+
+class AgentSettings(BaseModel):
+    # Also the base of the output image links in chat history
+    url: str = "http://localhost:9090"
+    # Agent replicas; when empty, `url` is the only endpoint
+    urls: List[str] = []
+    virtual_nodes: int = 64
+    failure_threshold: int = 3
+    recovery_timeout: float = 30.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    connect_timeout: float = 5.0
+    read_timeout: float = 10.0
+    write_timeout: float = 10.0
+    pool_timeout: float = 5.0
+    http2: bool = False
+
+    @property
+    def endpoints(self) -> List[str]:
+        return self.urls or [self.url]
+
+class StreamSettings(BaseModel):
+    # Longest a single shared XREAD blocks; also the worst-case delay before a newly subscribed stream is read
+    block_ms: int = 1000
+    # Entries a subscriber may fall behind before it is dropped
+    max_queue: int = 1000
+    batch_size: int = 500
+    # SSE coalescing: buffer events for up to this long (0 disables) or until the byte budget is hit
+    coalesce_ms: int = 0
+    coalesce_max_bytes: int = 65536
+
+class RetentionSettings(BaseModel):
+    enabled: bool = True
+    # Approximate MAXLEN applied on every append
+    max_len: int = 10000
+    # Entries older than this are trimmed with MINID
+    retention_seconds: int = 86400
+    # Finished runs idle this long are moved to Mongo and their streams dropped
+    compact_after_seconds: int = 600
+    # 0 deletes compacted streams right away, otherwise they expire after this many seconds
+    compacted_ttl_seconds: int = 0
+    interval_seconds: float = 60.0
+
+class DockerSettings(BaseModel):
+    enabled: bool = True
+    # Defaults to DOCKER_HOST and friends from the environment
+    base_url: Optional[str] = None
+    api_timeout: int = 10
+    call_timeout: float = 30.0
+    workers: int = 4
+    retry_after_seconds: float = 30.0
+
+class FilesSettings(BaseModel):
+    storage_dir: str = "workspace"
+    # Largest file accepted, checked while streaming
+    max_upload_bytes: int = 10 * 1024 ** 3
+    chunk_size: int = 1024 ** 2
+    # Unfinished resumable uploads are removed after this long without activity
+    upload_expiry_seconds: int = 86400
+    # Unreferenced blobs are kept this long before being collected
+    blob_gc_grace_seconds: int = 3600
+    # 0 disables the background collector
+    blob_gc_interval_seconds: float = 600.0
+    # Email of the user who gets files found loose in storage_dir by
+    # `python -m cognitus_ai.files.import_legacy`; unset gives them to every
+    # existing user, as they were shared by all before
+    legacy_files_owner: str | None = None
 
 class Config(BaseModel):
     llm: LLMSettings
@@ -35,6 +117,13 @@ class Config(BaseModel):
     mongo: MongoSettings
     cors_origin: List[str]
     auth: AuthSettings
+    agent: AgentSettings = AgentSettings()
+    stream: StreamSettings = StreamSettings()
+    retention: RetentionSettings = RetentionSettings()
+    docker: DockerSettings = DockerSettings()
+    files: FilesSettings = FilesSettings()
+    # Cold starts slower than this are logged as warnings; 0 disables the check
+    startup_budget_seconds: float = 2.0
 
     model_config = ConfigDict(
         extra="ignore",
@@ -48,4 +137,5 @@ def load_config(config_path: str = "config.yaml") -> Config:
         config_dict = yaml.safe_load(expanded_yaml)
         return Config(**config_dict)
 
-config = load_config()
+with startup_timer.phase("config"):
+    config = load_config()
@@ -1,16 +1,19 @@
 from redis.asyncio import Redis
 from motor.motor_asyncio import AsyncIOMotorClient
 from .config import config
+from .utils.startup import startup_timer
 
-redis_client = Redis(
-    host=config.redis.host,
-    port=config.redis.port,
-    db=config.redis.db,
-    decode_responses=True
-)
+with startup_timer.phase("redis_client"):
+    redis_client = Redis(
+        host=config.redis.host,
+        port=config.redis.port,
+        db=config.redis.db,
+        decode_responses=True
+    )
 
-mongodb_client = AsyncIOMotorClient(config.mongo.url)
-db = mongodb_client[config.mongo.database]
+with startup_timer.phase("mongo_client"):
+    mongodb_client = AsyncIOMotorClient(config.mongo.url)
+    db = mongodb_client[config.mongo.database]
 
 async def get_db():
     return db
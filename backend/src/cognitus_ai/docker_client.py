@@ -0,0 +1,120 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, TypeVar
+
+from .config import DockerSettings, config
+from .utils.logging import logger
+
+if TYPE_CHECKING:
+    import docker
+
+T = TypeVar("T")
+
+
+class DockerUnavailable(Exception):
+    """Raised when Docker is disabled, unreachable, or a call to it timed out."""
+
+
+class DockerProvider:
+    """Lazily created, shared Docker client whose calls run off the event loop.
+
+    Nothing touches Docker (or imports the SDK) until the first `run`, so importing
+    the app stays cheap even when the socket is slow or missing. The docker SDK is
+    blocking, so every call runs on a small dedicated thread pool and is bounded by
+    `call_timeout`. A failed connection attempt is remembered for
+    `retry_after_seconds` instead of being retried on every call.
+
+    A timed out call is abandoned, not interrupted: its thread finishes in the
+    background, so keep calls short or idempotent.
+    """
+
+    def __init__(self, settings: DockerSettings):
+        self.settings = settings
+        self._client: "docker.DockerClient | None" = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = asyncio.Lock()
+        self._failed_at: float | None = None
+        self.calls_total = 0
+        self.errors_total = 0
+        self.timeouts_total = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.settings.workers, thread_name_prefix="docker")
+        return self._executor
+
+    async def _call(self, fn: Callable[..., T], *args: Any, timeout: float | None = None) -> T:
+        future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        try:
+            return await asyncio.wait_for(future, timeout or self.settings.call_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts_total += 1
+            raise DockerUnavailable("Docker call timed out")
+
+    def _connect(self) -> "docker.DockerClient":
+        import docker
+
+        if self.settings.base_url:
+            client = docker.DockerClient(base_url=self.settings.base_url, timeout=self.settings.api_timeout)
+        else:
+            client = docker.from_env(timeout=self.settings.api_timeout)
+        client.ping()
+        return client
+
+    async def get_client(self) -> "docker.DockerClient":
+        if self._client is not None:
+            return self._client
+        if not self.settings.enabled:
+            raise DockerUnavailable("Docker access is disabled")
+
+        async with self._lock:
+            if self._client is not None:
+                return self._client
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self.settings.retry_after_seconds:
+                raise DockerUnavailable("Docker was unreachable recently")
+
+            start = time.perf_counter()
+            try:
+                self._client = await self._call(self._connect)
+            except Exception as e:
+                self._failed_at = time.monotonic()
+                logger.warning(f"Could not initialize Docker client: {e}")
+                raise DockerUnavailable(str(e)) from e
+            self._failed_at = None
+            logger.info(f"Docker client initialized in {(time.perf_counter() - start) * 1000:.1f}ms")
+            return self._client
+
+    async def run(self, fn: Callable[["docker.DockerClient"], T], timeout: float | None = None) -> T:
+        """Run `fn(client)` on the Docker thread pool, e.g. `run(lambda c: c.containers.get(name))`."""
+        client = await self.get_client()
+        self.calls_total += 1
+        try:
+            return await self._call(fn, client, timeout=timeout)
+        except DockerUnavailable:
+            raise
+        except Exception:
+            self.errors_total += 1
+            raise
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.settings.enabled,
+            "connected": self._client is not None,
+            "workers": self.settings.workers,
+            "calls_total": self.calls_total,
+            "errors_total": self.errors_total,
+            "timeouts_total": self.timeouts_total,
+        }
+
+
+docker_provider = DockerProvider(config.docker)
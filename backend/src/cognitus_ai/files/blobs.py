@@ -0,0 +1,187 @@
+import asyncio
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+from starlette.concurrency import run_in_threadpool
+
+from cognitus_ai.config import FilesSettings, config
+from cognitus_ai.database import db
+from cognitus_ai.utils.logging import logger
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStore:
+    """Content-addressed storage for uploaded files, keyed by SHA-256.
+
+    Each distinct content is stored once, at `<root>/<2 hex>/<sha256>`, and has a
+    document in the `blobs` collection counting how many (user, filename) entries
+    point at it. Releasing the last reference does not delete the blob right away:
+    the collector removes blobs that have been unreferenced for longer than
+    `blob_gc_grace_seconds`, so a re-upload shortly after a delete is still free.
+
+    The collector claims a blob (marks it `deleting`) before removing the file, and
+    `acquire` never takes a reference on a claimed blob, so a concurrent upload
+    cannot end up pointing at a deleted file.
+    """
+
+    def __init__(self, root: Path, db: AsyncIOMotorDatabase, settings: FilesSettings):
+        self.root = root
+        self.settings = settings
+        self.collection = db["blobs"]
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._task: Optional[asyncio.Task] = None
+        self.deduplicated_total = 0
+        self.deduplicated_bytes_total = 0
+        self.collected_total = 0
+        self.collected_bytes_total = 0
+
+    async def ensure_indexes(self) -> None:
+        # Backs the collector's scan for unreferenced blobs
+        await self.collection.create_index([("refcount", 1), ("released_at", 1)])
+
+    def path(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    async def acquire(self, sha256: str) -> bool:
+        """Take a reference on an existing blob; False if we do not have it."""
+        if not SHA256_PATTERN.match(sha256):
+            return False
+        result = await self.collection.update_one(
+            {"_id": sha256, "deleting": {"$ne": True}},
+            {"$inc": {"refcount": 1}, "$unset": {"released_at": ""}},
+        )
+        if result.matched_count == 0:
+            return False
+        if not await run_in_threadpool(self.path(sha256).is_file):
+            await self.release(sha256)
+            return False
+        return True
+
+    async def add(self, temp_path: Path, sha256: str, size: int) -> bool:
+        """Store a fully written temp file as a blob and take a reference on it.
+
+        Returns True if the content was already stored, in which case the temp file
+        is simply dropped.
+        """
+        for _ in range(50):
+            try:
+                await self.collection.update_one(
+                    {"_id": sha256, "deleting": {"$ne": True}},
+                    {
+                        "$inc": {"refcount": 1},
+                        "$unset": {"released_at": ""},
+                        "$setOnInsert": {"size": size, "created_at": datetime.now(timezone.utc)},
+                    },
+                    upsert=True,
+                )
+                break
+            except DuplicateKeyError:
+                # The collector is removing this blob right now; wait for it to finish
+                await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError(f"Blob {sha256} is stuck being collected")
+
+        blob_path = self.path(sha256)
+
+        def _store() -> bool:
+            if blob_path.is_file():
+                temp_path.unlink(missing_ok=True)
+                return True
+            blob_path.parent.mkdir(exist_ok=True)
+            os.replace(temp_path, blob_path)
+            # A moved file keeps its mtime; the orphan sweep goes by it
+            os.utime(blob_path)
+            return False
+
+        deduplicated = await run_in_threadpool(_store)
+        if deduplicated:
+            self.deduplicated_total += 1
+            self.deduplicated_bytes_total += size
+        return deduplicated
+
+    async def release(self, sha256: str) -> None:
+        await self.collection.update_one(
+            {"_id": sha256, "refcount": {"$gt": 0}},
+            [{"$set": {
+                "refcount": {"$subtract": ["$refcount", 1]},
+                "released_at": {"$cond": [{"$lte": ["$refcount", 1]}, datetime.now(timezone.utc), "$released_at"]},
+            }}],
+        )
+
+    async def collect(self) -> int:
+        """Delete blobs that have been unreferenced for longer than the grace period."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.settings.blob_gc_grace_seconds)
+        collected = 0
+        while True:
+            blob = await self.collection.find_one_and_update(
+                {"refcount": {"$lte": 0}, "released_at": {"$lt": cutoff}, "deleting": {"$ne": True}},
+                {"$set": {"deleting": True}},
+            )
+            if blob is None:
+                break
+            await run_in_threadpool(self.path(blob["_id"]).unlink, missing_ok=True)
+            await self.collection.delete_one({"_id": blob["_id"]})
+            collected += 1
+            self.collected_total += 1
+            self.collected_bytes_total += blob.get("size", 0)
+
+        # Blob files left behind by a crash between writing the file and recording it
+        known = {doc["_id"] async for doc in self.collection.find({}, {"_id": 1})}
+        orphan_cutoff = time.time() - self.settings.blob_gc_grace_seconds
+
+        def _sweep_orphans() -> int:
+            removed = 0
+            for path in self.root.glob("*/*"):
+                try:
+                    if path.name not in known and path.stat().st_mtime < orphan_cutoff:
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+            return removed
+
+        collected += await run_in_threadpool(_sweep_orphans)
+        return collected
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                collected = await self.collect()
+                if collected:
+                    logger.info(f"Collected {collected} unreferenced blobs")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Blob collection failed: {e}")
+            await asyncio.sleep(self.settings.blob_gc_interval_seconds)
+
+    async def start(self) -> None:
+        if self.settings.blob_gc_interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "deduplicated_total": self.deduplicated_total,
+            "deduplicated_bytes_total": self.deduplicated_bytes_total,
+            "collected_total": self.collected_total,
+            "collected_bytes_total": self.collected_bytes_total,
+        }
+
+
+blob_store = BlobStore(Path(config.files.storage_dir) / ".blobs", db, config.files)
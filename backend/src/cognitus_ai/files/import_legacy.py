@@ -0,0 +1,21 @@
+import asyncio
+from cognitus_ai.auth.service import auth_service
+from cognitus_ai.config import config
+from cognitus_ai.database import mongodb_client
+from .repository import file_repository
+
+async def main():
+    # Files left over from the shared, unindexed workspace are given to the
+    # configured owner, or to every user
+    owner = config.files.legacy_files_owner
+    query = {"email": owner} if owner else {}
+    owner_ids = [str(user["_id"]) async for user in auth_service.user_repository.collection.find(query, {"_id": 1})]
+    if not owner_ids:
+        print(f"Legacy files owner {owner} not found, files not imported." if owner else "No users, files not imported.")
+    else:
+        imported = await file_repository.import_loose_files(owner_ids)
+        print(f"Imported {imported} files from the shared workspace for {len(owner_ids)} users.")
+    mongodb_client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
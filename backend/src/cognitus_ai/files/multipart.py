@@ -0,0 +1,102 @@
+from typing import AsyncIterator, List, Optional
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# Bytes of form fields and part headers allowed before the file part starts
+MAX_PREAMBLE_BYTES = 1024 ** 2
+
+
+class MalformedUpload(Exception):
+    pass
+
+
+class MultipartFileStream:
+    """Streams one file field out of a multipart/form-data body as it arrives.
+
+    Starlette's form parsing spools the whole body to a temp file before the
+    handler runs; this feeds the request stream through python-multipart's
+    push parser instead, so the upload can be size-checked and written as it
+    comes in. Other fields are skipped, and anything after the file is not read.
+    """
+
+    def __init__(self, content_type: str, body: AsyncIterator[bytes], field: str = "file"):
+        media_type, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if media_type != b"multipart/form-data" or not boundary:
+            raise MalformedUpload("Expected a multipart/form-data body")
+
+        self.body = body
+        self.field = field
+        self.filename: Optional[str] = None
+        self._pending: List[bytes] = []
+        self._in_file = False
+        self._file_done = False
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: dict[bytes, bytes] = {}
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = params.get(b"name", b"").decode("utf-8", "replace")
+        filename = params.get(b"filename")
+        if name == self.field and filename is not None and self.filename is None:
+            self.filename = filename.decode("utf-8", "replace")
+            self._in_file = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._pending.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+
+    async def start(self) -> str:
+        """Read up to the file part and return its filename."""
+        consumed = 0
+        async for chunk in self.body:
+            self._parser.write(chunk)
+            if self.filename is not None:
+                return self.filename
+            consumed += len(chunk)
+            if consumed > MAX_PREAMBLE_BYTES:
+                break
+        raise MalformedUpload(f"No '{self.field}' file in the upload")
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """The file's bytes, in the pieces they arrive in; call after `start`."""
+        while True:
+            pending, self._pending = self._pending, []
+            for piece in pending:
+                yield piece
+            if self._file_done:
+                return
+            try:
+                chunk = await self.body.__anext__()
+            except StopAsyncIteration:
+                raise MalformedUpload("Upload ended before the file was complete")
+            self._parser.write(chunk)
@@ -45,44 +45,252 @@
 #             file_path.unlink()
 #             return True
 #         return False
+import hashlib
+import os
+from datetime import datetime, timezone
 from pathlib import Path
-import shutil
-from typing import List, Optional
+import re
+from typing import Any, AsyncIterator, BinaryIO, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from starlette.concurrency import run_in_threadpool
+from cognitus_ai.config import FilesSettings, config
+from cognitus_ai.database import db
+from cognitus_ai.utils.nanoid import generate_id
+from .blobs import BlobStore, blob_store
+
+class FileTooLarge(Exception):
+    """Raised mid-stream as soon as an upload goes past the size limit."""
+
+def write_chunk(buffer: BinaryIO, hasher: Any, chunk: bytes) -> None:
+    # hashlib releases the GIL for large updates, so hashing here costs the event loop nothing
+    buffer.write(chunk)
+    if hasher is not None:
+        hasher.update(chunk)
+
+def sync_and_close(buffer: BinaryIO) -> None:
+    try:
+        buffer.flush()
+        os.fsync(buffer.fileno())
+    finally:
+        buffer.close()
+
+async def rechunk(chunks: AsyncIterator[bytes], size: int) -> AsyncIterator[bytes]:
+    """Regroup a stream of arbitrarily sized pieces (e.g. a request body) into `size`-byte chunks."""
+    pending = bytearray()
+    async for piece in chunks:
+        pending += piece
+        while len(pending) >= size:
+            yield bytes(pending[:size])
+            del pending[:size]
+    if pending:
+        yield bytes(pending)
+
+def hash_file(path: Path, chunk_size: int) -> Tuple[str, int]:
+    """(hex SHA-256, size) of a file on disk."""
+    hasher = hashlib.sha256()
+    size = 0
+    with path.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+# Listing shape of a files document
+FILE_PROJECTION = {"_id": 0, "filename": 1, "size": 1, "sha256": 1, "updated_at": 1}
+
+def _to_file(file_dict: dict) -> dict:
+    return {
+        "id": file_dict["filename"],
+        "filename": file_dict["filename"],
+        "size": file_dict["size"],
+        "sha256": file_dict["sha256"],
+        "updated_at": file_dict.get("updated_at")
+    }
 
 class FileRepository:
-    def __init__(self, base_dir: Path):
+    """Per-user files, as an index of (user, filename) -> content blob.
+
+    The bytes live in the BlobStore, stored once per distinct content; the `files`
+    collection maps each user's filenames to blobs, so re-uploading a dataset (by
+    anyone) costs no extra storage and same-name uploads by different users no
+    longer collide.
+    """
+
+    def __init__(self, base_dir: Path, db: AsyncIOMotorDatabase, blobs: BlobStore, settings: FilesSettings = config.files):
         self.base_dir = base_dir
+        self.settings = settings
+        self.collection = db["files"]
+        self.blobs = blobs
+        # In-progress uploads; a hidden directory, so list_files never sees them
+        self.uploads_dir = base_dir / ".uploads"
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.uploads_dir.mkdir(exist_ok=True)
 
-    def save_file(self, filename: str, file_obj) -> Path:
-        file_path = self.base_dir / filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file_obj, buffer)
-        return file_path
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index([("user_id", 1), ("filename", 1)], unique=True)
+        # Back the sortable listing fields
+        await self.collection.create_index([("user_id", 1), ("size", 1)])
+        await self.collection.create_index([("user_id", 1), ("updated_at", 1)])
+        await self.blobs.ensure_indexes()
 
-    def list_files(self) -> List[dict]:
-        if not self.base_dir.exists():
-            return []
-            
-        files = []
-        for file_path in self.base_dir.iterdir():
-            if file_path.is_file():
-                files.append({
-                    "id": file_path.name,
-                    "filename": file_path.name,
-                    "size": file_path.stat().st_size
-                })
-        return files
-
-    def get_file_path(self, file_id: str) -> Optional[Path]:
-        file_path = self.base_dir / file_id
-        if file_path.exists() and file_path.is_file():
+    async def save_stream(self, user_id: str, filename: str, chunks: AsyncIterator[bytes]) -> dict:
+        """Stream an upload to disk without blocking the event loop.
+
+        Chunks are written (and SHA-256 hashed) on the thread pool into a temp file,
+        the size limit is enforced as bytes arrive, and the file is only stored and
+        indexed once it is complete.
+        """
+        temp_path = self.uploads_dir / f"{generate_id()}.part"
+        hasher = hashlib.sha256()
+        size = 0
+        buffer = await run_in_threadpool(temp_path.open, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > self.settings.max_upload_bytes:
+                    raise FileTooLarge(f"File exceeds the {self.settings.max_upload_bytes} byte limit")
+                await run_in_threadpool(write_chunk, buffer, hasher, chunk)
+            await run_in_threadpool(sync_and_close, buffer)
+            return await self.commit(user_id, temp_path, filename, size, hasher.hexdigest())
+        except BaseException:
+            buffer.close()
+            temp_path.unlink(missing_ok=True)
+            raise
+
+    async def _owns(self, user_id: str, sha256: str) -> Optional[dict]:
+        return await self.collection.find_one({"user_id": user_id, "sha256": sha256}, {"size": 1})
+
+    async def commit(self, user_id: str, temp_path: Path, filename: str, size: int, sha256: str) -> dict:
+        """Store a fully written temp file and point `filename` at it."""
+        # Only the user's own files count as duplicates in the response: whether
+        # anyone else stores this content is not theirs to learn
+        deduplicated = await self._owns(user_id, sha256) is not None
+        await self.blobs.add(temp_path, sha256, size)
+        file = await self._point(user_id, Path(filename).name, sha256, size)
+        return {**file, "deduplicated": deduplicated}
+
+    async def link(self, user_id: str, filename: str, sha256: str) -> Optional[dict]:
+        """Add `filename` as a copy of content the user already has; None if they do not.
+
+        A hash is not proof of having the content, so other users' files are never
+        linked; content the user does not have yet has to be uploaded.
+        """
+        sha256 = sha256.lower()
+        owned = await self._owns(user_id, sha256)
+        if owned is None or not await self.blobs.acquire(sha256):
+            return None
+        file = await self._point(user_id, Path(filename).name, sha256, owned["size"])
+        return {**file, "deduplicated": True}
+
+    async def import_loose_files(self, owner_ids: List[str]) -> int:
+        """Move files left directly in the storage directory into the blob store.
+
+        Before files were indexed per user, uploads were plain files in one shared
+        directory that every user could see, so each one is given to all of
+        `owner_ids`. A name an owner already uses is left alone for that owner.
+        """
+        def _loose_files() -> List[Path]:
+            return [path for path in self.base_dir.iterdir() if path.is_file() and not path.name.startswith(".")]
+
+        if not owner_ids:
+            return 0
+        paths = await run_in_threadpool(_loose_files)
+        taken = {
+            (doc["user_id"], doc["filename"])
+            async for doc in self.collection.find(
+                {"user_id": {"$in": owner_ids}, "filename": {"$in": [path.name for path in paths]}},
+                {"_id": 0, "user_id": 1, "filename": 1},
+            )
+        }
+        imported = 0
+        for path in paths:
+            try:
+                sha256, size = await run_in_threadpool(hash_file, path, self.settings.chunk_size)
+            except FileNotFoundError:
+                # Deleted or imported by someone else in the meantime
+                continue
+            # Takes one reference, handed to the first owner that gets the file
+            try:
+                await self.blobs.add(path, sha256, size)
+            except FileNotFoundError:
+                await self.blobs.release(sha256)
+                continue
+            spare_reference = True
+            for user_id in owner_ids:
+                if (user_id, path.name) in taken:
+                    continue
+                if not spare_reference and not await self.blobs.acquire(sha256):
+                    break
+                spare_reference = False
+                await self._point(user_id, path.name, sha256, size)
+            if spare_reference:
+                await self.blobs.release(sha256)
+            imported += 1
+        return imported
+
+    async def _point(self, user_id: str, filename: str, sha256: str, size: int) -> dict:
+        # The caller already holds a reference on the new blob; give back the one on the old
+        now = datetime.now(timezone.utc)
+        previous = await self.collection.find_one_and_update(
+            {"user_id": user_id, "filename": filename},
+            {
+                "$set": {"sha256": sha256, "size": size, "updated_at": now},
+                "$setOnInsert": {"created_at": now},
+            },
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+        if previous is not None:
+            await self.blobs.release(previous["sha256"])
+        return _to_file({"filename": filename, "size": size, "sha256": sha256, "updated_at": now})
+
+    async def list_files(
+        self,
+        user_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        sort: str = "filename",
+        order: str = "asc",
+        q: Optional[str] = None,
+        extension: Optional[str] = None
+    ) -> Tuple[int, List[dict]]:
+        """A page of the user's files as (total matching, page), served from the index alone."""
+        query: dict[str, Any] = {"user_id": user_id}
+        patterns = []
+        if q:
+            patterns.append({"filename": {"$regex": re.escape(q), "$options": "i"}})
+        if extension:
+            suffix = extension if extension.startswith(".") else f".{extension}"
+            patterns.append({"filename": {"$regex": f"{re.escape(suffix)}$", "$options": "i"}})
+        if patterns:
+            query["$and"] = patterns
+
+        direction = DESCENDING if order == "desc" else ASCENDING
+        cursor = self.collection.find(query, FILE_PROJECTION).sort([(sort, direction), ("filename", direction)]).skip(offset)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        files = [_to_file(file_dict) async for file_dict in cursor]
+        if offset == 0 and (limit is None or len(files) < limit):
+            total = len(files)
+        else:
+            total = await self.collection.count_documents(query)
+        return total, files
+
+    async def get_file_path(self, user_id: str, file_id: str) -> Optional[Path]:
+        file_dict = await self.collection.find_one({"user_id": user_id, "filename": file_id}, {"sha256": 1})
+        if file_dict is None:
+            return None
+        file_path = self.blobs.path(file_dict["sha256"])
+        if await run_in_threadpool(file_path.is_file):
             return file_path
         return None
 
-    def delete_file(self, file_id: str) -> bool:
-        file_path = self.base_dir / file_id
-        if file_path.exists() and file_path.is_file():
-            file_path.unlink()
-            return True
-        return False
\ No newline at end of file
+    async def delete_file(self, user_id: str, file_id: str) -> bool:
+        file_dict = await self.collection.find_one_and_delete({"user_id": user_id, "filename": file_id})
+        if file_dict is None:
+            return False
+        await self.blobs.release(file_dict["sha256"])
+        return True
+
+file_repository = FileRepository(Path(config.files.storage_dir), db, blob_store)
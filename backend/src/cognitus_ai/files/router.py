@@ -80,57 +80,214 @@
 #         raise HTTPException(status_code=404, detail="File not found")
 #     return {"message": f"File {file_id} deleted successfully"}
 import os
-from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from fastapi.responses import FileResponse
-from typing import Annotated, List
+from typing import Annotated, List, Literal, Optional
 
 from cognitus_ai.auth.dependencies import get_current_user
 from cognitus_ai.auth.schemas import User
-from .repository import FileRepository
+from cognitus_ai.config import config
+from .multipart import MalformedUpload, MultipartFileStream
+from .repository import FileRepository, FileTooLarge, file_repository, rechunk
+from .schemas import CompleteUploadRequest, CreateUploadRequest, LinkFileRequest, UploadSession
+from .uploads import ChecksumMismatch, UploadNotFound, UploadOffsetMismatch, UploadSessions, upload_sessions
 
 router = APIRouter(prefix="/files", tags=["files"])
 
-STORAGE_DIR = Path("workspace")
-
 def get_file_repository() -> FileRepository:
-    return FileRepository(STORAGE_DIR)
+    return file_repository
+
+def get_upload_sessions() -> UploadSessions:
+    return upload_sessions
 
 ALLOWED_EXTENSIONS = {".csv", ".xlsx", ".json", ".txt", ".md", ".pdf"}
 
-@router.post("/upload")
-async def upload_file(
-    current_user: Annotated[User, Depends(get_current_user)],
-    file: UploadFile = File(...),
-    file_repo: FileRepository = Depends(get_file_repository)
-):
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No filename provided")
-    
-    file_ext = os.path.splitext(file.filename)[1].lower()
+def _check_extension(filename: str):
+    file_ext = os.path.splitext(filename)[1].lower()
     if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400, 
             detail=f"File extension {file_ext} not allowed."
         )
+
+def _file_too_large(e: FileTooLarge) -> HTTPException:
+    return HTTPException(status_code=413, detail=str(e))
+
+def _upload_not_found() -> HTTPException:
+    return HTTPException(status_code=404, detail="Upload not found")
+
+def _offset_mismatch(e: UploadOffsetMismatch) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail=str(e),
+        headers={"Upload-Offset": str(e.offset)},
+    )
+
+# The multipart body is parsed from the request stream, so the form is only described for the docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                }
+            }
+        },
+    }
+}
+
+@router.post("/upload", openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_file(
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+    file_repo: FileRepository = Depends(get_file_repository)
+):
+    """Upload a file as a multipart form field named `file`.
+
+    The body is streamed to storage as it arrives and cut off at the upload size
+    limit, whether or not a Content-Length was sent.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > config.files.max_upload_bytes + 65536:
+        raise _file_too_large(FileTooLarge(f"File exceeds the {config.files.max_upload_bytes} byte limit"))
+
+    try:
+        upload = MultipartFileStream(request.headers.get("content-type", ""), request.stream())
+        filename = await upload.start()
+    except MalformedUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not filename:
+        raise HTTPException(status_code=400, detail="No filename provided")
+    _check_extension(filename)
         
     try:
-        file_repo.save_file(file.filename, file.file)
+        saved = await file_repo.save_stream(str(current_user.id), filename, rechunk(upload.chunks(), config.files.chunk_size))
         return {
-            "id": file.filename,
-            "filename": file.filename,
+            **saved,
             "status": "success"
         }
+    except FileTooLarge as e:
+        raise _file_too_large(e)
+    except MalformedUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/link")
+async def link_file(
+    body: LinkFileRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    file_repo: FileRepository = Depends(get_file_repository)
+):
+    """Add a file as a copy of one of the caller's own files, by content hash.
+
+    Content the caller does not already have gets `"linked": false` and has to be
+    uploaded; the answer is the same whether or not anyone else stores it.
+    """
+    _check_extension(body.filename)
+    linked = await file_repo.link(str(current_user.id), body.filename, body.sha256)
+    if linked is None:
+        return {"linked": False, "status": "upload_required"}
+    return {
+        **linked,
+        "linked": True,
+        "status": "success"
+    }
+
+@router.post("/uploads", response_model=UploadSession)
+async def create_upload(
+    body: CreateUploadRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    sessions: UploadSessions = Depends(get_upload_sessions)
+):
+    _check_extension(body.filename)
+    try:
+        return await sessions.create(str(current_user.id), body.filename, body.size)
+    except FileTooLarge as e:
+        raise _file_too_large(e)
+
+@router.get("/uploads/{upload_id}", response_model=UploadSession)
+async def get_upload(
+    upload_id: str,
+    current_user: Annotated[User, Depends(get_current_user)],
+    sessions: UploadSessions = Depends(get_upload_sessions)
+):
+    try:
+        return await sessions.status(str(current_user.id), upload_id)
+    except UploadNotFound:
+        raise _upload_not_found()
+
+@router.put("/uploads/{upload_id}", response_model=UploadSession)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    current_user: Annotated[User, Depends(get_current_user)],
+    offset: int = Query(ge=0),
+    sessions: UploadSessions = Depends(get_upload_sessions)
+):
+    """Append the raw request body to the upload, starting at `offset`."""
+    try:
+        return await sessions.append(
+            str(current_user.id), upload_id, offset, rechunk(request.stream(), config.files.chunk_size)
+        )
+    except UploadNotFound:
+        raise _upload_not_found()
+    except UploadOffsetMismatch as e:
+        raise _offset_mismatch(e)
+    except FileTooLarge as e:
+        raise _file_too_large(e)
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    body: CompleteUploadRequest,
+    current_user: Annotated[User, Depends(get_current_user)],
+    sessions: UploadSessions = Depends(get_upload_sessions)
+):
+    try:
+        saved = await sessions.complete(str(current_user.id), upload_id, body.sha256)
+    except UploadNotFound:
+        raise _upload_not_found()
+    except UploadOffsetMismatch as e:
+        raise _offset_mismatch(e)
+    except ChecksumMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {
+        **saved,
+        "status": "success"
+    }
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(
+    upload_id: str,
+    current_user: Annotated[User, Depends(get_current_user)],
+    sessions: UploadSessions = Depends(get_upload_sessions)
+):
+    try:
+        await sessions.abort(str(current_user.id), upload_id)
+    except UploadNotFound:
+        raise _upload_not_found()
+    return {"message": f"Upload {upload_id} aborted"}
+
 @router.get("", response_model=List[dict])
 async def fetch_files(
+    response: Response,
     current_user: Annotated[User, Depends(get_current_user)],
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    sort: Literal["filename", "size", "updated_at"] = "filename",
+    order: Literal["asc", "desc"] = "asc",
+    q: Optional[str] = None,
+    extension: Optional[str] = None,
     file_repo: FileRepository = Depends(get_file_repository)
 ):
     try:
-        return file_repo.list_files()
+        total, files = await file_repo.list_files(str(current_user.id), offset, limit, sort, order, q, extension)
+        response.headers["X-Total-Count"] = str(total)
+        return files
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -140,7 +297,7 @@ async def download_file(
     current_user: Annotated[User, Depends(get_current_user)],
     file_repo: FileRepository = Depends(get_file_repository)
 ):
-    file_path = file_repo.get_file_path(file_id)
+    file_path = await file_repo.get_file_path(str(current_user.id), file_id)
     if not file_path:
         raise HTTPException(status_code=404, detail="File not found")
         
@@ -156,7 +313,7 @@ async def delete_file(
     current_user: Annotated[User, Depends(get_current_user)],
     file_repo: FileRepository = Depends(get_file_repository)
 ):
-    success = file_repo.delete_file(file_id)
+    success = await file_repo.delete_file(str(current_user.id), file_id)
     if not success:
         raise HTTPException(status_code=404, detail="File not found")
     return {"message": f"File {file_id} deleted successfully"}
\ No newline at end of file
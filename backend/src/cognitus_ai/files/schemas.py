@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field
+
+class CreateUploadRequest(BaseModel):
+    filename: str
+    # Total size, if known up front; checked against the upload limit immediately
+    size: int | None = Field(default=None, ge=0)
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "filename": "sales.csv",
+                    "size": 5368709120
+                }
+            ]
+        }
+    }
+
+class UploadSession(BaseModel):
+    upload_id: str
+    filename: str
+    size: int | None = None
+    # Bytes received so far; the next chunk must start here
+    offset: int
+
+class CompleteUploadRequest(BaseModel):
+    # Optional hex SHA-256 of the whole file, verified before the upload is committed
+    sha256: str | None = None
+
+class LinkFileRequest(BaseModel):
+    filename: str
+    # Hex SHA-256 of content that may already be stored
+    sha256: str = Field(pattern=r"^[0-9a-fA-F]{64}$")
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from cognitus_ai.utils.nanoid import generate_id
+from .repository import FileRepository, FileTooLarge, file_repository, hash_file, sync_and_close, write_chunk
+from .schemas import UploadSession
+
+UPLOAD_ID_PATTERN = re.compile(r"^[a-z0-9]+$")
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class UploadOffsetMismatch(Exception):
+    """The chunk does not start where the upload currently ends; `offset` is where it does."""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class UploadSessions:
+    """Resumable uploads for files too large to send in one request.
+
+    The client creates a session, PUTs the file in chunks at increasing offsets
+    (after a dropped connection it asks for the current offset and carries on from
+    there), then completes it, which commits the file atomically.
+
+    A session is a `.part` file plus a JSON sidecar in the uploads directory, so
+    any worker can continue it. The running SHA-256 lives in the memory of the
+    worker that received the bytes; if chunks arrive at different workers the file
+    is re-hashed on completion instead. Chunks for one session are serialized per
+    worker, so clients should not send them to several workers concurrently.
+    """
+
+    def __init__(self, repository: FileRepository):
+        self.repository = repository
+        self.settings = repository.settings
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # upload id -> (bytes hashed, running hash)
+        self._hashers: Dict[str, Tuple[int, Any]] = {}
+
+    def _part_path(self, upload_id: str) -> Path:
+        return self.repository.uploads_dir / f"{upload_id}.part"
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.repository.uploads_dir / f"{upload_id}.json"
+
+    def _load(self, user_id: str, upload_id: str) -> Tuple[Dict[str, Any], int]:
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            raise UploadNotFound(upload_id)
+        try:
+            meta = json.loads(self._meta_path(upload_id).read_text())
+            offset = self._part_path(upload_id).stat().st_size
+        except FileNotFoundError:
+            raise UploadNotFound(upload_id)
+        # Other users' sessions are indistinguishable from missing ones
+        if meta.get("user_id") != user_id:
+            raise UploadNotFound(upload_id)
+        return meta, offset
+
+    def _to_session(self, upload_id: str, meta: Dict[str, Any], offset: int) -> UploadSession:
+        return UploadSession(upload_id=upload_id, filename=meta["filename"], size=meta["size"], offset=offset)
+
+    def _remove(self, upload_id: str) -> None:
+        self._part_path(upload_id).unlink(missing_ok=True)
+        self._meta_path(upload_id).unlink(missing_ok=True)
+
+    def _expire_stale(self) -> None:
+        cutoff = time.time() - self.settings.upload_expiry_seconds
+        for path in self.repository.uploads_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _lock(self, upload_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(upload_id, asyncio.Lock())
+
+    async def create(self, user_id: str, filename: str, size: Optional[int] = None) -> UploadSession:
+        if size is not None and size > self.settings.max_upload_bytes:
+            raise FileTooLarge(f"File exceeds the {self.settings.max_upload_bytes} byte limit")
+        await run_in_threadpool(self._expire_stale)
+
+        upload_id = generate_id()
+        meta = {"user_id": user_id, "filename": Path(filename).name, "size": size}
+
+        def _create() -> None:
+            self._part_path(upload_id).touch()
+            self._meta_path(upload_id).write_text(json.dumps(meta))
+
+        await run_in_threadpool(_create)
+        self._hashers[upload_id] = (0, hashlib.sha256())
+        return self._to_session(upload_id, meta, 0)
+
+    async def status(self, user_id: str, upload_id: str) -> UploadSession:
+        meta, offset = await run_in_threadpool(self._load, user_id, upload_id)
+        return self._to_session(upload_id, meta, offset)
+
+    async def append(self, user_id: str, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> UploadSession:
+        """Write `chunks` at `offset`, which must be the current end of the upload.
+
+        Whatever arrives before the client disconnects is kept, so the upload can be
+        resumed from the offset reported by `status`.
+        """
+        async with self._lock(upload_id):
+            meta, current = await run_in_threadpool(self._load, user_id, upload_id)
+            if offset != current:
+                raise UploadOffsetMismatch(current)
+
+            limit = self.settings.max_upload_bytes
+            if meta["size"] is not None:
+                limit = min(limit, meta["size"])
+            entry = self._hashers.get(upload_id)
+            hasher = entry[1] if entry is not None and entry[0] == current else None
+
+            part_path = self._part_path(upload_id)
+            buffer = await run_in_threadpool(part_path.open, "r+b")
+            buffer.seek(current)
+            written = current
+            try:
+                async for chunk in chunks:
+                    if written + len(chunk) > limit:
+                        raise FileTooLarge(f"Upload exceeds its {limit} byte limit")
+                    await run_in_threadpool(write_chunk, buffer, hasher, chunk)
+                    written += len(chunk)
+            finally:
+                await run_in_threadpool(sync_and_close, buffer)
+                if hasher is not None:
+                    self._hashers[upload_id] = (written, hasher)
+                else:
+                    self._hashers.pop(upload_id, None)
+                # Activity keeps the session from expiring
+                await run_in_threadpool(os.utime, self._meta_path(upload_id))
+
+            return self._to_session(upload_id, meta, written)
+
+    async def complete(self, user_id: str, upload_id: str, sha256: Optional[str] = None) -> dict:
+        async with self._lock(upload_id):
+            meta, size = await run_in_threadpool(self._load, user_id, upload_id)
+            if meta["size"] is not None and size != meta["size"]:
+                raise UploadOffsetMismatch(size)
+
+            entry = self._hashers.pop(upload_id, None)
+            if entry is not None and entry[0] == size:
+                digest = entry[1].hexdigest()
+            else:
+                digest, _ = await run_in_threadpool(hash_file, self._part_path(upload_id), self.settings.chunk_size)
+            if sha256 is not None and sha256.lower() != digest:
+                raise ChecksumMismatch(f"Expected sha256 {sha256}, got {digest}")
+
+            result = await self.repository.commit(user_id, self._part_path(upload_id), meta["filename"], size, digest)
+            await run_in_threadpool(self._remove, upload_id)
+        self._locks.pop(upload_id, None)
+        return result
+
+    async def abort(self, user_id: str, upload_id: str) -> None:
+        async with self._lock(upload_id):
+            await run_in_threadpool(self._load, user_id, upload_id)
+            self._hashers.pop(upload_id, None)
+            await run_in_threadpool(self._remove, upload_id)
+        self._locks.pop(upload_id, None)
+
+
+upload_sessions = UploadSessions(file_repository)
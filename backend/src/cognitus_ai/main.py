@@ -1,31 +1,38 @@
+from .utils.startup import startup_timer
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import config
-from .auth.router import router as auth_router
-from .files.router import router as files_router
-from .chat.router import router as chat_router
 from .database import mongodb_client
+with startup_timer.phase("routers"):
+    from .auth.router import router as auth_router
+    from .files.router import router as files_router
+    from .chat.router import router as chat_router
+from .chat.service import agent_client
+from .chat.streams import stream_multiplexer
+from .chat.retention import stream_retention
+from .auth.cache import user_cache
+from .auth.passwords import password_pool
+from .auth.utils import token_cache_info
+from .migrations import run_migrations
+from .docker_client import docker_provider
+from .files.blobs import blob_store
+from .utils.parse_action import parse_action_cache_info
 from contextlib import asynccontextmanager
-import subprocess
-import json
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    spec = app.openapi()
-    with open("./openapi.json", "w", encoding="utf-8") as f:
-        json.dump(spec, f, indent=2)
-    try:
-        _ = subprocess.run([
-            "openapi2postmanv2",
-            "-s", "openapi.json",
-            "-o", "postman-collection.json",
-            "-p",
-            "--options retainRequestBodyExamples:true"
-        ], check=True, shell=True)
-        print("Postman collection generated successfully.")
-    except Exception as e:
-        print("Failed to generate Postman collection:", e)
+    await run_migrations()
+    await agent_client.start()
+    await stream_retention.start()
+    await blob_store.start()
+    startup_timer.report(config.startup_budget_seconds)
     yield 
+    await stream_retention.close()
+    await blob_store.close()
+    await stream_multiplexer.close()
+    await agent_client.close()
+    password_pool.close()
+    docker_provider.close()
     mongodb_client.close()
 
 app = FastAPI(
@@ -49,4 +56,19 @@ app.include_router(chat_router)
 
 @app.get("/health", tags=["system"])
 async def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/metrics", tags=["system"])
+async def metrics():
+    return {
+        "parse_action_cache": parse_action_cache_info(),
+        "agent_client": agent_client.metrics(),
+        "stream_multiplexer": stream_multiplexer.metrics(),
+        "stream_retention": stream_retention.metrics(),
+        "user_cache": user_cache.metrics(),
+        "token_cache": token_cache_info(),
+        "password_pool": password_pool.metrics(),
+        "docker": docker_provider.metrics(),
+        "blob_store": blob_store.metrics(),
+        "startup": startup_timer.summary,
+    }
\ No newline at end of file
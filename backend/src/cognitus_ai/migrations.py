@@ -0,0 +1,18 @@
+from pymongo.errors import OperationFailure
+
+from .auth.service import auth_service
+from .chat.repository import chat_repository
+from .files.repository import file_repository
+from .utils.logging import logger
+
+
+async def run_migrations() -> None:
+    """Idempotent schema setup run at startup: creates the indexes the queries rely on."""
+    try:
+        await auth_service.user_repository.ensure_indexes()
+    except OperationFailure as e:
+        # Most likely existing duplicate emails, which have to be merged by hand first
+        logger.error(f"Could not create the unique index on users.email: {e}")
+        raise
+    await chat_repository.ensure_indexes()
+    await file_repository.ensure_indexes()
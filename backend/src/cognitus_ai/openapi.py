@@ -0,0 +1,37 @@
+import argparse
+import json
+import shutil
+import subprocess
+from .main import app
+
+def write_openapi(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(app.openapi(), f, indent=2)
+    print(f"OpenAPI spec written to {path}.")
+
+def write_postman(spec_path: str, path: str) -> None:
+    command = shutil.which("openapi2postmanv2")
+    if command is None:
+        raise SystemExit("openapi2postmanv2 not found; install it with `npm install -g openapi-to-postmanv2`.")
+    subprocess.run([
+        command,
+        "-s", spec_path,
+        "-o", path,
+        "-p",
+        "-O", "retainRequestBodyExamples=true",
+    ], check=True)
+    print(f"Postman collection written to {path}.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the API's OpenAPI spec and Postman collection.")
+    parser.add_argument("--output", default="openapi.json")
+    parser.add_argument("--postman-output", default="postman-collection.json")
+    parser.add_argument("--no-postman", action="store_true", help="only write the OpenAPI spec")
+    args = parser.parse_args()
+
+    write_openapi(args.output)
+    if not args.no_postman:
+        write_postman(args.output, args.postman_output)
+
+if __name__ == "__main__":
+    main()
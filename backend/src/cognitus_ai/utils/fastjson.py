@@ -0,0 +1,20 @@
+import json
+from typing import Any
+
+# orjson is optional; it is several times faster than the stdlib for the small payloads we stream
+try:
+    import orjson
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    def loads(data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+except ImportError:
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj)
+
+    def loads(data: str | bytes) -> Any:
+        return json.loads(data)
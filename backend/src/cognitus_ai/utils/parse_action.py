@@ -1,13 +1,63 @@
 import yaml
 import re
+import hashlib
+from collections import OrderedDict
 from typing import Optional, Dict, Any
 
-def parse_action(text: str) -> Optional[Dict[str, Any]]:
-    match = re.search(r"```yaml\n(.*?)\n```", text, re.DOTALL)
+YAML_BLOCK_PATTERN = re.compile(r"```yaml\n(.*?)\n```", re.DOTALL)
+
+# libyaml's C loader is several times faster; fall back when PyYAML was built without it
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+PARSE_ACTION_CACHE_SIZE = 4096
+
+# Keyed by (loader name, content hash): the loaders do not always agree
+_cache: "OrderedDict[tuple[str, bytes], Optional[Dict[str, Any]]]" = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0}
+
+def _parse(text: str, loader: Any) -> Optional[Dict[str, Any]]:
+    match = YAML_BLOCK_PATTERN.search(text)
     if match:
         yaml_content = match.group(1)
         try:
-            return yaml.safe_load(yaml_content)
+            return yaml.load(yaml_content, Loader=loader)
         except Exception:
             return None
     return None
+
+def parse_action(text: str, use_cache: bool = True, fast: bool = True) -> Optional[Dict[str, Any]]:
+    """Extract the YAML action block from an assistant message.
+
+    Results are memoized by loader and content hash, so the returned dict is
+    shared between callers and must be treated as read-only. `fast` selects the
+    C loader when it is available.
+    """
+    loader = YamlLoader if fast else yaml.SafeLoader
+    if not use_cache:
+        return _parse(text, loader)
+
+    key = (loader.__name__, hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+    if key in _cache:
+        _cache.move_to_end(key)
+        _cache_stats["hits"] += 1
+        return _cache[key]
+
+    _cache_stats["misses"] += 1
+    action = _parse(text, loader)
+    _cache[key] = action
+    if len(_cache) > PARSE_ACTION_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return action
+
+def parse_action_cache_info() -> Dict[str, Any]:
+    return {
+        **_cache_stats,
+        "size": len(_cache),
+        "max_size": PARSE_ACTION_CACHE_SIZE,
+        "c_loader": YamlLoader is not yaml.SafeLoader,
+    }
+
+def clear_parse_action_cache() -> None:
+    _cache.clear()
+    _cache_stats["hits"] = 0
+    _cache_stats["misses"] = 0
@@ -0,0 +1,44 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+from .logging import logger
+
+
+class StartupTimer:
+    """Records how long each cold-start phase takes, for the report logged at startup.
+
+    Phases can nest: "routers" covers importing the routers, which includes
+    building the service singletons they import.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.summary: Dict[str, Any] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self, budget_seconds: float) -> Dict[str, Any]:
+        total = time.perf_counter() - self.started_at
+        lines = ", ".join(f"{name}={duration * 1000:.1f}ms" for name, duration in self.phases)
+        message = f"Startup took {total * 1000:.1f}ms ({lines})"
+        if budget_seconds > 0 and total > budget_seconds:
+            logger.warning(f"{message}, over the {budget_seconds * 1000:.0f}ms budget")
+        else:
+            logger.info(message)
+        self.summary = {
+            "total_ms": round(total * 1000, 1),
+            "budget_ms": round(budget_seconds * 1000, 1),
+            "phases_ms": {name: round(duration * 1000, 1) for name, duration in self.phases},
+        }
+        return self.summary
+
+
+startup_timer = StartupTimer()
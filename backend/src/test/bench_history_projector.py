@@ -0,0 +1,66 @@
+import sys
+import time
+
+from cognitus_ai.chat.history import HistoryProjector, process_history
+
+
+def make_turn(i: int) -> list[dict]:
+	tool_call = (
+		"Let me look at the data.\n\n"
+		"```yaml\n"
+		"action: execute_code\n"
+		f"explaination: Inspect step {i}\n"
+		"parameters:\n"
+		"  code: |\n"
+		"    import pandas as pd\n"
+		f"    df = pd.read_csv('data_{i}.csv')\n"
+		"    print(df.describe())\n"
+		"```"
+	)
+	return [
+		{"id": f"call-{i}", "role": "assistant", "type": "tool_call", "content": tool_call},
+		{"id": f"result-{i}", "role": "user", "type": "tool_result", "content": f"output {i}", "image": [f"plot_{i}.png"]},
+	]
+
+
+def per_event_cost(history: list[dict], incoming: list[dict], incremental: bool) -> float:
+	"""Average seconds spent handling one streamed message on top of `history`."""
+	buffer = list(history)
+	projector = HistoryProjector()
+	projector.feed(buffer)
+	processed_len = len(process_history(buffer))
+
+	start = time.perf_counter()
+	for msg in incoming:
+		if incremental:
+			projector.feed([msg])
+		else:
+			buffer.append(msg)
+			new_items = process_history(buffer)[processed_len:]
+			processed_len += len(new_items)
+	return (time.perf_counter() - start) / len(incoming)
+
+
+def main(sizes: list[int]) -> int:
+	seed = [{"id": "seed", "role": "user", "type": "instruction", "content": "[USER INSTRUCTION]: analyse"}]
+	incoming = [msg for i in range(10) for msg in make_turn(100_000 + i)]
+
+	# The incremental projector must agree with the full rebuild
+	full = seed + [msg for i in range(50) for msg in make_turn(i)]
+	projector = HistoryProjector()
+	incremental = [item for msg in full for item in projector.feed([msg])]
+	assert incremental == process_history(full), "incremental projection diverged from process_history"
+
+	print(f"{'history':>8} {'full rebuild (ms/event)':>24} {'incremental (ms/event)':>24}")
+	for size in sizes:
+		history = seed + [msg for i in range(size // 2) for msg in make_turn(i)]
+		full_cost = per_event_cost(history, incoming, incremental=False)
+		incr_cost = per_event_cost(history, incoming, incremental=True)
+		print(f"{len(history):>8} {full_cost * 1000:>24.3f} {incr_cost * 1000:>24.3f}")
+	return 0
+
+
+if __name__ == "__main__":
+	# Optional override via CLI: python bench_history_projector.py 100 500 1000
+	sizes = [int(arg) for arg in sys.argv[1:]] or [100, 500, 1000, 2000]
+	sys.exit(main(sizes))
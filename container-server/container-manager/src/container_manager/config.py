@@ -1,10 +1,68 @@
+from typing import Literal, Optional
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+class NodeConfig(BaseModel):
+    id: str
+    # "fake" simulates a Docker host in memory, for trying out scheduling locally
+    driver: Literal["docker", "fake"] = "docker"
+    # Docker API endpoint, e.g. "tcp://10.0.0.5:2376"; unset uses the local environment
+    base_url: Optional[str] = None
+    # Address clients and the manager use to reach ports published on this node
+    address: str = "127.0.0.1"
+    # Override what the node reports about itself (required for fake nodes)
+    cpus: Optional[float] = None
+    memory: Optional[int] = None
+
 class Settings(BaseSettings):    
     REDIS_HOST: str = "127.0.0.1"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 1
 
+    CONTAINER_IMAGE: str = "container-node-app:latest"
+    # Port container-node listens on inside the container (see app.Dockerfile)
+    CONTAINER_PORT: int = 31942
+    # Path on that port answering 200 once the node is ready
+    CONTAINER_HEALTH_PATH: str = "/health"
+    # Address of the local Docker host when NODES is not set
+    CONTAINER_HOST: str = "127.0.0.1"
+    CONTAINER_START_TIMEOUT_SECONDS: float = 60.0
+    # Home directory of the node user, kept in a per-container volume across hibernation
+    CONTAINER_WORKSPACE_PATH: str = "/home/cognitus"
+    # Host ports to publish containers on, e.g. "40000-40999"; empty lets Docker pick one
+    HOST_PORT_RANGE: str = ""
+    # Per-container limits; 0 or empty means unlimited
+    CONTAINER_CPUS: float = 1.0
+    CONTAINER_MEMORY: str = "1g"
+    CONTAINER_PIDS_LIMIT: int = 512
+
+    # Docker hosts to place containers on, as JSON; empty means the local Docker only
+    NODES: list[NodeConfig] = []
+    # "binpack" fills the busiest node that still fits; "spread" picks the least loaded one
+    SCHEDULER_STRATEGY: Literal["binpack", "spread"] = "binpack"
+    # Sandboxes are mostly idle, so more CPUs can be handed out than a node has
+    NODE_CPU_OVERCOMMIT: float = 4.0
+    NODE_HEARTBEAT_SECONDS: float = 10.0
+    # Nodes that have not reported for this long are not placed on
+    NODE_HEARTBEAT_TTL_SECONDS: int = 30
+    # Reservations whose container has not shown up on its node for this long are
+    # given back, e.g. after a manager died mid-create
+    NODE_RESERVATION_GRACE_SECONDS: float = 300.0
+
+    # Images to keep pre-started containers for; empty means just CONTAINER_IMAGE
+    WARM_POOL_IMAGES: list[str] = []
+    # Ready containers kept per image; 0 disables the pool
+    WARM_POOL_SIZE: int = 2
+    # Pooled containers older than this are replaced with fresh ones
+    WARM_POOL_MAX_IDLE_SECONDS: int = 3600
+    WARM_POOL_REFILL_INTERVAL_SECONDS: float = 10.0
+    # Refills of an image whose containers fail to start are retried with doubling delays, up to this
+    WARM_POOL_MAX_BACKOFF_SECONDS: float = 300.0
+
+    # Containers without execute/file activity for this long are hibernated; 0 disables it
+    IDLE_TIMEOUT_SECONDS: int = 1800
+    REAPER_INTERVAL_SECONDS: float = 60.0
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 settings = Settings()
@@ -1,6 +1,3 @@
-import docker
-docker_client = docker.from_env()
-
 from redis.asyncio import Redis
 from .config import settings
 
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import secrets
+import time
+from typing import Any, Dict, List, Optional
+from cuid2 import cuid_wrapper
+from redis.asyncio import Redis
+from container_manager.config import Settings, settings
+from container_manager.connections import redis_client
+from container_manager.util import logger
+from .runtime import is_healthy, remove_container, start_container, wait_until_healthy
+
+cuid = cuid_wrapper()
+
+
+class WarmPool:
+    """Pre-started, health-checked containers, ready to be handed out on create.
+
+    Each image has a Redis list of ready containers (`warm_pool:{image}`); an entry
+    carries everything needed to hand the container over, including the access
+    token it was started with. Claiming is an LPOP, so two managers can never hand
+    out the same container. A background task tops each list back up to
+    `WARM_POOL_SIZE` and replaces containers that have sat idle for longer than
+    `WARM_POOL_MAX_IDLE_SECONDS`; a per-image Redis lock keeps several managers
+    from refilling the same pool at once. An image whose containers fail to start
+    (a bad image, no capacity) is retried with a doubling delay instead of on
+    every pass.
+    """
+
+    def __init__(self, redis: Redis, settings: Settings):
+        self.redis = redis
+        self.settings = settings
+        self.images: List[str] = settings.WARM_POOL_IMAGES or [settings.CONTAINER_IMAGE]
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        # Per image: consecutive refills with a failed start, and when to try again
+        self._failed_refills: Dict[str, int] = {}
+        self._retry_at: Dict[str, float] = {}
+        self.hits_total = 0
+        self.misses_total = 0
+        self.started_total = 0
+        self.start_failures_total = 0
+        self.discarded_total = 0
+
+    def _key(self, image: str) -> str:
+        return f"warm_pool:{image}"
+
+    def _lock_key(self, image: str) -> str:
+        return f"warm_pool:{image}:refill"
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.WARM_POOL_SIZE > 0
+
+    async def claim(self, image: str) -> Optional[Dict[str, Any]]:
+        """Take a ready container off the pool, or None if there is none."""
+        if not self.enabled or image not in self.images:
+            return None
+        try:
+            while True:
+                raw = await self.redis.lpop(self._key(image))  # pyright: ignore[reportGeneralTypeIssues]
+                if not isinstance(raw, str):
+                    self.misses_total += 1
+                    return None
+                entry = json.loads(raw)
+                # It has been idle since the last health check; make sure it is still up
+                if self._expired(entry) or not await is_healthy(entry["node"], entry["port"]):
+                    await self._discard(entry)
+                    continue
+                self.hits_total += 1
+                return entry
+        finally:
+            self._wakeup.set()
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["started_at"] > self.settings.WARM_POOL_MAX_IDLE_SECONDS
+
+    async def _discard(self, entry: Dict[str, Any]) -> None:
+        self.discarded_total += 1
+        try:
+            await remove_container(entry["name"], entry["node"])
+        except Exception as e:
+            logger.warning(f"Could not remove pooled container {entry['name']}: {e}")
+
+    async def _start_one(self, image: str) -> bool:
+        container_id = cuid()
+        token = secrets.token_urlsafe(32)
+        try:
+            started = await start_container(container_id, image, token, labels={"warm_pool": "true"})
+        except Exception as e:
+            self.start_failures_total += 1
+            logger.error(f"Could not start pooled container for {image}: {e}")
+            return False
+
+        entry = {
+            "container_id": container_id,
+            "image": image,
+            "token": token,
+            "started_at": time.time(),
+            **started,
+        }
+        if not await wait_until_healthy(started["node"], started["port"], self.settings.CONTAINER_START_TIMEOUT_SECONDS):
+            self.start_failures_total += 1
+            logger.error(f"Pooled container {container_id} did not become healthy")
+            await self._discard(entry)
+            return False
+
+        await self.redis.rpush(self._key(image), json.dumps(entry))  # pyright: ignore[reportGeneralTypeIssues]
+        self.started_total += 1
+        return True
+
+    def _backoff(self, image: str, succeeded: bool) -> None:
+        if succeeded:
+            self._failed_refills.pop(image, None)
+            self._retry_at.pop(image, None)
+            return
+        failures = self._failed_refills.get(image, 0) + 1
+        self._failed_refills[image] = failures
+        delay = min(
+            self.settings.WARM_POOL_REFILL_INTERVAL_SECONDS * 2 ** (failures - 1),
+            self.settings.WARM_POOL_MAX_BACKOFF_SECONDS,
+        )
+        self._retry_at[image] = time.monotonic() + delay
+        logger.warning(f"Warm pool for {image} failed to start containers {failures} times in a row, retrying in {delay:.0f}s")
+
+    async def _expire_idle(self, image: str) -> None:
+        raw_entries = await self.redis.lrange(self._key(image), 0, -1)  # pyright: ignore[reportGeneralTypeIssues]
+        for raw in raw_entries:
+            entry = json.loads(raw)
+            # Only the manager that manages to remove the entry tears the container down
+            if self._expired(entry) and await self.redis.lrem(self._key(image), 1, raw):  # pyright: ignore[reportGeneralTypeIssues]
+                await self._discard(entry)
+
+    async def refill(self, image: str) -> None:
+        lock_ttl = int(self.settings.CONTAINER_START_TIMEOUT_SECONDS) + 30
+        token = secrets.token_hex(8)
+        if not await self.redis.set(self._lock_key(image), token, nx=True, ex=lock_ttl):
+            return
+        try:
+            await self._expire_idle(image)
+            missing = self.settings.WARM_POOL_SIZE - await self.redis.llen(self._key(image))  # pyright: ignore[reportGeneralTypeIssues]
+            if missing > 0:
+                started = await asyncio.gather(*(self._start_one(image) for _ in range(missing)))
+                self._backoff(image, all(started))
+        finally:
+            if await self.redis.get(self._lock_key(image)) == token:
+                await self.redis.delete(self._lock_key(image))
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            for image in self.images:
+                if time.monotonic() < self._retry_at.get(image, 0.0):
+                    continue
+                try:
+                    await self.refill(image)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Warm pool refill for {image} failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.settings.WARM_POOL_REFILL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        # Ready containers are left running for the next manager to hand out
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def metrics(self) -> Dict[str, Any]:
+        ready = {image: await self.redis.llen(self._key(image)) for image in self.images}  # pyright: ignore[reportGeneralTypeIssues]
+        return {
+            "size": self.settings.WARM_POOL_SIZE,
+            "ready": ready,
+            "hits_total": self.hits_total,
+            "misses_total": self.misses_total,
+            "started_total": self.started_total,
+            "start_failures_total": self.start_failures_total,
+            "discarded_total": self.discarded_total,
+            "backing_off": sorted(image for image, at in self._retry_at.items() if at > time.monotonic()),
+        }
+
+
+warm_pool = WarmPool(redis_client, settings)
@@ -0,0 +1,96 @@
+import random
+from typing import Dict, Optional, Tuple
+from redis.asyncio import Redis
+from container_manager.config import Settings, settings
+from container_manager.connections import redis_client
+
+
+def parse_port_range(value: str) -> Optional[Tuple[int, int]]:
+    if not value:
+        return None
+    first, _, last = value.partition("-")
+    start, end = int(first), int(last or first)
+    if not 0 < start <= end < 65536:
+        raise ValueError(f"Invalid host port range: {value!r}")
+    return start, end
+
+
+# Leases a port and records it against its container in one step, so a lease
+# is never left without the reverse entry that releases it.
+# KEYS: node ports hash, container -> lease hash; ARGV: port, container id, lease
+LEASE_SCRIPT = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+return 1
+"""
+
+
+class PortsExhausted(Exception):
+    pass
+
+
+class PortAllocator:
+    """Leases host ports from HOST_PORT_RANGE to containers, per node.
+
+    `host_ports:{node}` maps each leased port to its container and
+    `container_host_ports` maps back, so a port can be returned when its
+    container is removed. Leasing is an HSETNX (together with the reverse entry,
+    in a script), so concurrent creates (also from other managers) never get the
+    same port. With no range configured Docker
+    picks an ephemeral port instead.
+    """
+
+    CONTAINERS_KEY = "container_host_ports"
+
+    def __init__(self, redis: Redis, settings: Settings):
+        self.redis = redis
+        self.range = parse_port_range(settings.HOST_PORT_RANGE)
+        self._lease = self.redis.register_script(LEASE_SCRIPT)
+
+    def _ports_key(self, node_id: str) -> str:
+        return f"host_ports:{node_id}"
+
+    @property
+    def enabled(self) -> bool:
+        return self.range is not None
+
+    async def allocate(self, node_id: str, container_id: str, exclude: frozenset[int] = frozenset()) -> int:
+        assert self.range is not None
+        start, end = self.range
+        # Start somewhere random so concurrent creates do not all race for the same port
+        size = end - start + 1
+        offset = random.randrange(size)
+        for i in range(size):
+            port = start + (offset + i) % size
+            if port in exclude:
+                continue
+            leased = await self._lease(
+                keys=[self._ports_key(node_id), self.CONTAINERS_KEY],
+                args=[port, container_id, f"{node_id}|{port}"],
+            )
+            if leased:
+                return port
+        raise PortsExhausted(f"No free host ports in {start}-{end} on node {node_id}")
+
+    async def release(self, container_id: str) -> None:
+        lease = await self.redis.hget(self.CONTAINERS_KEY, container_id)  # pyright: ignore[reportGeneralTypeIssues]
+        if lease is None:
+            return
+        node_id, _, port = lease.rpartition("|")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self._ports_key(node_id), port)
+            pipe.hdel(self.CONTAINERS_KEY, container_id)
+            await pipe.execute()
+
+    async def metrics(self) -> Dict[str, object]:
+        if self.range is None:
+            return {"range": None}
+        start, end = self.range
+        # Leases across all nodes; each node has the whole range to itself
+        leased = await self.redis.hlen(self.CONTAINERS_KEY)  # pyright: ignore[reportGeneralTypeIssues]
+        return {"range": f"{start}-{end}", "leased": leased}
+
+
+port_allocator = PortAllocator(redis_client, settings)
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+from container_manager.config import Settings, settings
+from container_manager.util import logger
+from .service import ContainerService, container_service
+
+BATCH_SIZE = 100
+
+
+class IdleReaper:
+    """Hibernates containers that have had no execute or file activity for a while.
+
+    Activity is recorded per container by `ContainerService.record_activity`. A
+    hibernated container is removed but its workspace volume is kept, and the next
+    activity starts it again on the same node, with the same token and files.
+    """
+
+    def __init__(self, service: ContainerService, settings: Settings):
+        self.service = service
+        self.settings = settings
+        self._task: Optional[asyncio.Task] = None
+        self.failures_total = 0
+
+    async def reap(self) -> int:
+        idle_before = time.time() - self.settings.IDLE_TIMEOUT_SECONDS
+        hibernated = 0
+        while True:
+            container_ids = await self.service.repo.idle(idle_before, BATCH_SIZE)
+            if not container_ids:
+                break
+            for container_id in container_ids:
+                try:
+                    if await self.service.hibernate(container_id, idle_before):
+                        hibernated += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failures_total += 1
+                    # Leave it for the next run instead of retrying it in this one
+                    await self.service.repo.touch(container_id)
+                    logger.warning(f"Could not hibernate container {container_id}: {e}")
+        return hibernated
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                hibernated = await self.reap()
+                if hibernated:
+                    logger.info(f"Hibernated {hibernated} idle containers")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Idle reaper run failed: {e}")
+            await asyncio.sleep(self.settings.REAPER_INTERVAL_SECONDS)
+
+    async def start(self) -> None:
+        if self.settings.IDLE_TIMEOUT_SECONDS > 0 and self._task is None:
+            await self.service.repo.track_untracked()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "idle_timeout_seconds": self.settings.IDLE_TIMEOUT_SECONDS,
+            "failures_total": self.failures_total,
+            **self.service.metrics(),
+        }
+
+
+idle_reaper = IdleReaper(container_service, settings)
@@ -1,12 +1,17 @@
 import json
-from typing import Optional, Dict
+import time
+from typing import Optional, Dict, List, Tuple
 from redis.asyncio import Redis
 from container_manager.connections import redis_client
 
+MGET_BATCH_SIZE = 500
+
 class ContainerRepository:
     def __init__(self):
         self.redis: Redis = redis_client
         self.CONTAINER_SET_KEY = "containers"
+        # container id -> time of the last execute or file activity
+        self.ACTIVITY_KEY = "container_activity"
 
     def _get_key(self, container_id: str) -> str:
         return f"container:{container_id}"
@@ -23,16 +28,64 @@ class ContainerRepository:
             return json.loads(data)
         return None
 
-    async def list_all(self) -> Dict[str, dict]:
-        container_ids = await self.redis.smembers(self.CONTAINER_SET_KEY) # pyright: ignore[reportGeneralTypeIssues]
+    async def get_many(self, container_ids: List[str]) -> Dict[str, dict]:
+        """Containers by id, fetched with one MGET per MGET_BATCH_SIZE ids."""
         result = {}
-        for cid in container_ids:
-            container = await self.get(cid)
-            if container:
-                result[cid] = container
+        for start in range(0, len(container_ids), MGET_BATCH_SIZE):
+            batch = container_ids[start:start + MGET_BATCH_SIZE]
+            values = await self.redis.mget([self._get_key(cid) for cid in batch])
+            for cid, data in zip(batch, values):
+                if data:
+                    result[cid] = json.loads(data)
         return result
 
+    async def list_page(self, cursor: int = 0, count: int = 100) -> Tuple[int, Dict[str, dict]]:
+        """One SSCAN step over the container set; a next cursor of 0 means the scan is done.
+
+        As with SSCAN itself, `count` is a hint: a page can hold somewhat more or
+        fewer containers, and the same container can show up on two pages.
+        """
+        next_cursor, container_ids = await self.redis.sscan(self.CONTAINER_SET_KEY, cursor, count=count) # pyright: ignore[reportGeneralTypeIssues]
+        return next_cursor, await self.get_many(list(container_ids))
+
+    async def list_all(self) -> Dict[str, dict]:
+        result = {}
+        cursor = 0
+        while True:
+            cursor, page = await self.list_page(cursor, MGET_BATCH_SIZE)
+            result.update(page)
+            if cursor == 0:
+                return result
+
     async def delete(self, container_id: str) -> None:
         key = self._get_key(container_id)
         await self.redis.delete(key)
         await self.redis.srem(self.CONTAINER_SET_KEY, container_id) # pyright: ignore[reportGeneralTypeIssues]
+        await self.redis.zrem(self.ACTIVITY_KEY, container_id)
+
+    def lock(self, container_id: str, timeout: float):
+        """Serializes hibernating and resuming a container across managers."""
+        return self.redis.lock(f"{self._get_key(container_id)}:lock", timeout=timeout, sleep=0.1)
+
+    async def touch(self, container_id: str) -> None:
+        await self.redis.zadd(self.ACTIVITY_KEY, {container_id: time.time()})
+
+    async def last_activity(self, container_id: str) -> Optional[float]:
+        return await self.redis.zscore(self.ACTIVITY_KEY, container_id)
+
+    async def forget_activity(self, container_id: str) -> None:
+        await self.redis.zrem(self.ACTIVITY_KEY, container_id)
+
+    async def idle(self, before: float, limit: int) -> List[str]:
+        return await self.redis.zrangebyscore(self.ACTIVITY_KEY, "-inf", before, start=0, num=limit)
+
+    async def track_untracked(self) -> None:
+        """Start the idle clock for containers that have no recorded activity yet."""
+        now = time.time()
+        cursor = 0
+        while True:
+            cursor, container_ids = await self.redis.sscan(self.CONTAINER_SET_KEY, cursor, count=MGET_BATCH_SIZE) # pyright: ignore[reportGeneralTypeIssues]
+            if container_ids:
+                await self.redis.zadd(self.ACTIVITY_KEY, {cid: now for cid in container_ids}, nx=True)
+            if cursor == 0:
+                return
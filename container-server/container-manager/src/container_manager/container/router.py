@@ -1,18 +1,32 @@
-from fastapi import APIRouter, HTTPException
-from .service import ContainerService
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Response
+from .service import ResumeFailed, container_service as service
+from container_manager.nodes.scheduler import NoCapacity
 from container_manager.util import logger
 
 router = APIRouter()
-service = ContainerService()
 
 @router.get("/containers")
-async def list_containers():
-    return await service.list_containers()
+async def list_containers(
+    response: Response,
+    status: Optional[str] = Query(None, description="Only containers with this status, e.g. running or hibernated"),
+    cursor: Optional[int] = Query(None, ge=0, description="Page through the containers from here; start at 0"),
+    limit: int = Query(100, ge=1, le=1000, description="Page size hint when paging"),
+):
+    next_cursor, containers = await service.list_containers(status, cursor, limit)
+    if next_cursor is not None:
+        # 0 once the last page has been returned
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return containers
 
 @router.post("/containers")
 async def create_container():
     logger.info("Request received to create a new container")
-    container_id = await service.create_container()
+    try:
+        container_id = await service.create_container()
+    except NoCapacity:
+        logger.warning("Create failed. No node has room for another container")
+        raise HTTPException(503, "No capacity for another container")
     logger.info(f"Container created with ID: {container_id}")
     return {"container_id": container_id}
 
@@ -25,6 +39,23 @@ async def get_container_status(container_id: str):
     return {"container_id": container_id, "status": "ok"}
 
 
+@router.post("/containers/{container_id}/activity")
+async def record_activity(container_id: str):
+    # For clients that talk to the container directly, e.g. for file operations
+    try:
+        data = await service.record_activity(container_id)
+    except NoCapacity:
+        logger.warning(f"Resume failed. No node has room for container {container_id}")
+        raise HTTPException(503, "No capacity to resume the container")
+    except ResumeFailed as e:
+        logger.warning(f"Resume failed. {e}")
+        raise HTTPException(503, "The container could not be resumed, try again")
+    if not data:
+        raise HTTPException(404, "Container not found")
+
+    return {"container_id": container_id, "status": data["status"], "jupyter": data["jupyter"]}
+
+
 @router.delete("/containers/{container_id}")
 async def delete_container(container_id: str):
     logger.info(f"Request received to delete container: {container_id}")
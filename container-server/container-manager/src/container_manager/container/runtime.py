@@ -0,0 +1,152 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional, Set
+
+from docker.errors import APIError
+from fastapi.concurrency import run_in_threadpool
+from container_manager.config import settings
+from container_manager.nodes.drivers import NodeDriver
+from container_manager.nodes.scheduler import scheduler
+from container_manager.util import logger
+from .ports import PortsExhausted, port_allocator
+
+MAX_PORT_ATTEMPTS = 5
+
+
+def resource_limits() -> Dict[str, Any]:
+    limits: Dict[str, Any] = {}
+    if settings.CONTAINER_CPUS > 0:
+        limits["nano_cpus"] = int(settings.CONTAINER_CPUS * 1e9)
+    if settings.CONTAINER_MEMORY:
+        limits["mem_limit"] = settings.CONTAINER_MEMORY
+        # Same as the memory limit, i.e. no swap on top of it
+        limits["memswap_limit"] = settings.CONTAINER_MEMORY
+    if settings.CONTAINER_PIDS_LIMIT > 0:
+        limits["pids_limit"] = settings.CONTAINER_PIDS_LIMIT
+    return limits
+
+
+def _is_port_conflict(error: APIError) -> bool:
+    message = str(error).lower()
+    return "port is already allocated" in message or "address already in use" in message
+
+
+def workspace_volume(container_id: str) -> str:
+    return f"workspace-{container_id}"
+
+
+async def start_container(
+    container_id: str,
+    image: str,
+    token: str,
+    labels: Optional[Dict[str, str]] = None,
+    node_id: Optional[str] = None,
+) -> Dict[str, str]:
+    """Run a container-node container and return where its API was published.
+
+    The scheduler picks the node, unless `node_id` pins it, and reserves the
+    container's CPU and memory on it. The workspace is a named volume, which
+    outlives the container so a hibernated container can be started again with
+    its files. The container port is published on a host port leased from
+    HOST_PORT_RANGE, or one picked by Docker when no range is configured; either
+    way it is read back from the container once it is running. A node with no
+    ports left in the range is given up for the next one that fits. CPU, memory
+    and pids are capped so many sandboxes can share a host.
+    """
+    container_port = f"{settings.CONTAINER_PORT}/tcp"
+
+    def _start_container(driver: NodeDriver, host_port: Optional[int]):
+        return driver.run(
+            name=f"{container_id}",
+            container_port=container_port,
+            host_port=host_port,
+            image=image,
+            environment={
+                "ACCESS_TOKEN": token,
+            },
+            labels={
+                "created_by": "container_manager",
+                "container_id": container_id,
+                **(labels or {}),
+            },
+            volumes={
+                workspace_volume(container_id): {"bind": settings.CONTAINER_WORKSPACE_PATH, "mode": "rw"},
+            },
+            **resource_limits(),
+        )
+
+    async def _run_on(node_id: str, driver: NodeDriver) -> str:
+        if not port_allocator.enabled:
+            _, host_port = await run_in_threadpool(_start_container, driver, None)
+            return host_port
+        # Ports used by something outside the manager are skipped for this container
+        taken: Set[int] = set()
+        while True:
+            leased = await port_allocator.allocate(node_id, container_id, exclude=frozenset(taken))
+            try:
+                _, host_port = await run_in_threadpool(_start_container, driver, leased)
+                return host_port
+            except APIError as e:
+                await port_allocator.release(container_id)
+                if not _is_port_conflict(e) or len(taken) >= MAX_PORT_ATTEMPTS:
+                    raise
+                logger.warning(f"Host port {leased} is in use on {node_id} outside the manager, trying another")
+                taken.add(leased)
+                # The container was created before its port could be bound
+                await run_in_threadpool(driver.remove, container_id)
+            except Exception:
+                await port_allocator.release(container_id)
+                raise
+
+    # Nodes whose host port range is used up; placement moves on to the next one
+    exhausted: Set[str] = set()
+    while True:
+        placed = await scheduler.place(container_id, node_id, exclude=frozenset(exhausted))
+        driver = scheduler.driver(placed)
+        try:
+            host_port = await _run_on(placed, driver)
+            break
+        except PortsExhausted as e:
+            await scheduler.release(container_id)
+            logger.warning(f"{e}, trying another node")
+            exhausted.add(placed)
+        except Exception:
+            # Docker may have created the container before the start failed
+            try:
+                await run_in_threadpool(driver.remove, container_id)
+            except Exception as e:
+                logger.warning(f"Could not remove container {container_id} after a failed start: {e}")
+            await scheduler.release(container_id)
+            raise
+
+    return {
+        "name": container_id,
+        "node": placed,
+        "host": driver.node.address,
+        "port": host_port,
+    }
+
+
+async def remove_container(name: str, node_id: Optional[str] = None, keep_workspace: bool = False) -> None:
+    # Containers are named after their id
+    node_id = node_id or await scheduler.node_of(name) or scheduler.default_node
+    driver = scheduler.driver(node_id)
+    if not await run_in_threadpool(driver.remove, name):
+        logger.warning(f"Docker container already removed: {name}")
+    if not keep_workspace:
+        await run_in_threadpool(driver.remove_volume, workspace_volume(name))
+    await port_allocator.release(name)
+    await scheduler.release(name)
+
+
+async def is_healthy(node_id: str, port: str, timeout: float = 1.0) -> bool:
+    return await scheduler.driver(node_id).is_healthy(port, settings.CONTAINER_HEALTH_PATH, timeout)
+
+
+async def wait_until_healthy(node_id: str, port: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await is_healthy(node_id, port):
+            return True
+        await asyncio.sleep(0.5)
+    return False
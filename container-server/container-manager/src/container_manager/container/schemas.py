@@ -9,6 +9,11 @@ class JupyterConnection(BaseModel):
 
 class ContainerSchema(BaseModel):
     name: str
+    # "running", or "hibernated" once the reaper has removed it for being idle
     status: str
+    # Node the container was placed on
+    node: str = "local"
+    # Image to start it from again when it is resumed
+    image: str = "container-node-app:latest"
     jupyter: JupyterConnection
     envs: Dict[str, EnvSchema] = {}
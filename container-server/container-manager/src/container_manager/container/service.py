@@ -1,55 +1,60 @@
 from cuid2 import cuid_wrapper
 import secrets
-from typing import Dict, Optional
-from docker.errors import NotFound
-from fastapi.concurrency import run_in_threadpool
+import time
+from typing import Dict, Optional, Tuple
+from container_manager.config import settings
+from container_manager.nodes.scheduler import scheduler
 from container_manager.util import logger
-from container_manager.connections import docker_client
+from .pool import warm_pool
 from .repository import ContainerRepository
+from .runtime import remove_container, start_container, wait_until_healthy
 from .schemas import ContainerSchema, JupyterConnection
 
 cuid = cuid_wrapper()
 
+
+class ResumeFailed(Exception):
+    pass
+
+
 class ContainerService:
     def __init__(self):
         self.repo = ContainerRepository()
+        self.hibernated_total = 0
+        self.resumed_total = 0
+        self.last_resume_seconds: Optional[float] = None
 
-    async def create_container(self) -> str:
-        container_id = cuid()
-        token = secrets.token_urlsafe(32)
+    def _lock(self, container_id: str):
+        return self.repo.lock(container_id, timeout=settings.CONTAINER_START_TIMEOUT_SECONDS + 30)
+
+    async def create_container(self, image: Optional[str] = None) -> str:
+        image = image or settings.CONTAINER_IMAGE
 
         try:
-            def _start_container():
-                docker_container = docker_client.containers.run(
-                    image="container-node-app:latest",
-                    name=f"{container_id}",
-                    detach=True,
-                    ports={"8888/tcp": 8888},
-                    environment={
-                        "ACCESS_TOKEN": token,
-                    },
-                    labels={
-                        "created_by": "container_manager",
-                        "container_id": container_id,
-                    },
-                )
-                docker_container.reload()
-                return docker_container
-
-            docker_container = await run_in_threadpool(_start_container)
-            port_info = docker_container.attrs["NetworkSettings"]["Ports"]["8888/tcp"][0]
+            pooled = await warm_pool.claim(image)
+            if pooled is not None:
+                container_id = pooled["container_id"]
+                token = pooled["token"]
+                started = pooled
+            else:
+                container_id = cuid()
+                token = secrets.token_urlsafe(32)
+                started = await start_container(container_id, image, token)
 
             container_data = ContainerSchema(
-                name=docker_container.name or "unknown",
+                name=started["name"],
                 status="running",
+                node=started["node"],
+                image=image,
                 jupyter=JupyterConnection(
-                    host=port_info["HostIp"],
-                    port=port_info["HostPort"],
+                    host=started["host"],
+                    port=started["port"],
                     token=token,
                 ),
             )
 
             await self.repo.save(container_id, container_data.model_dump())
+            await self.repo.touch(container_id)
             return container_id
 
         except Exception as e:
@@ -59,25 +64,125 @@ class ContainerService:
     async def get_container(self, container_id: str) -> Optional[dict]:
         return await self.repo.get(container_id)
 
-    async def list_containers(self) -> Dict[str, dict]:
-        return await self.repo.list_all()
+    async def list_containers(
+        self,
+        status: Optional[str] = None,
+        cursor: Optional[int] = None,
+        limit: int = 100,
+    ) -> Tuple[Optional[int], Dict[str, dict]]:
+        """Containers as (next cursor, containers); all of them unless a cursor is given."""
+        if cursor is None:
+            next_cursor, containers = None, await self.repo.list_all()
+        else:
+            next_cursor, containers = await self.repo.list_page(cursor, limit)
+        if status is not None:
+            containers = {cid: data for cid, data in containers.items() if data.get("status") == status}
+        return next_cursor, containers
 
     async def delete_container(self, container_id: str) -> bool:
+        # Waits for a resume or hibernation in progress, which would otherwise
+        # start the container again or save the record back after it is gone
+        async with self._lock(container_id):
+            container = await self.repo.get(container_id)
+            if not container:
+                return False
+
+            try:
+                await remove_container(container["name"], container.get("node"))
+            except Exception as e:
+                logger.error(f"Error removing container {container_id}: {e}")
+
+            await self.repo.delete(container_id)
+            return True
+
+    async def record_activity(self, container_id: str) -> Optional[dict]:
+        """Note that the container is being used, resuming it first if it was hibernated."""
+        # Touch before reading the status: a hibernation that has not removed the
+        # container yet sees this activity and backs off
+        await self.repo.touch(container_id)
         container = await self.repo.get(container_id)
         if not container:
-            return False
+            await self.repo.forget_activity(container_id)
+            return None
+        if container["status"] != "running":
+            container = await self.resume(container_id)
+        return container
+
+    async def resume(self, container_id: str) -> Optional[dict]:
+        """Start a hibernated container again, on its node and with its workspace.
+
+        Raises ResumeFailed if it does not become healthy; it is left hibernated
+        so the next activity tries again.
+        """
+        async with self._lock(container_id):
+            container = await self.repo.get(container_id)
+            if not container or container["status"] == "running":
+                return container
+
+            started_at = time.monotonic()
+            # A manager that died mid-hibernate, or mid-resume (the reservation
+            # outlives a clean hibernation only then), may have left the container
+            # behind, and its name would clash with the new one
+            if container["status"] != "hibernated" or await scheduler.node_of(container_id) is not None:
+                await remove_container(container["name"], container.get("node"), keep_workspace=True)
+                container["status"] = "hibernated"
+                await self.repo.save(container_id, container)
+
+            image = container.get("image") or settings.CONTAINER_IMAGE
+            started = await start_container(container_id, image, container["jupyter"]["token"], node_id=container.get("node"))
+            if not await wait_until_healthy(started["node"], started["port"], settings.CONTAINER_START_TIMEOUT_SECONDS):
+                await remove_container(container["name"], started["node"], keep_workspace=True)
+                raise ResumeFailed(f"Container {container_id} did not become healthy")
+
+            container["status"] = "running"
+            container["jupyter"]["host"] = started["host"]
+            container["jupyter"]["port"] = started["port"]
+            await self.repo.save(container_id, container)
+
+            self.resumed_total += 1
+            self.last_resume_seconds = time.monotonic() - started_at
+            logger.info(f"Resumed container {container_id} in {self.last_resume_seconds:.2f}s")
+            return container
+
+    async def hibernate(self, container_id: str, idle_before: float) -> bool:
+        """Remove a container that has been idle since `idle_before`, keeping its workspace."""
+        async with self._lock(container_id):
+            container = await self.repo.get(container_id)
+            if not container or container["status"] not in ("running", "hibernating"):
+                await self.repo.forget_activity(container_id)
+                return False
+
+            # Still "hibernating" means a manager died partway through; finish the job
+            previous = container["status"]
+            if previous == "running":
+                # Mark it first, so activity from now on goes through resume and waits for us
+                container["status"] = "hibernating"
+                await self.repo.save(container_id, container)
+                last_activity = await self.repo.last_activity(container_id)
+                if last_activity is not None and last_activity >= idle_before:
+                    container["status"] = "running"
+                    await self.repo.save(container_id, container)
+                    return False
+
+            try:
+                await remove_container(container["name"], container.get("node"), keep_workspace=True)
+            except Exception:
+                container["status"] = previous
+                await self.repo.save(container_id, container)
+                raise
+
+            container["status"] = "hibernated"
+            await self.repo.save(container_id, container)
+            await self.repo.forget_activity(container_id)
+            self.hibernated_total += 1
+            return True
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "hibernated_total": self.hibernated_total,
+            "resumed_total": self.resumed_total,
+            "last_resume_seconds": self.last_resume_seconds,
+        }
 
-        try:
-            def _remove_container():
-                try:
-                    docker_container = docker_client.containers.get(container["name"])
-                    docker_container.remove(force=True)
-                except NotFound:
-                    logger.warning(f"Docker container already removed: {container['name']}")
-
-            await run_in_threadpool(_remove_container)
-        except Exception as e:
-            logger.error(f"Error removing container {container_id}: {e}")
 
-        await self.repo.delete(container_id)
-        return True
+container_service = ContainerService()
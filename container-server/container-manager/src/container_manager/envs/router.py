@@ -1,14 +1,29 @@
 from fastapi import APIRouter, HTTPException
 from .schemas import CreateEnvRequest, ExecuteCellRequest
 from .service import EnvService
+from container_manager.container.service import ResumeFailed, container_service
+from container_manager.nodes.scheduler import NoCapacity
 from container_manager.util import logger
 
 router = APIRouter()
 service = EnvService()
 
+
+async def record_activity(container_id: str) -> None:
+    # Keeps the container from being hibernated, and resumes it if it was
+    try:
+        await container_service.record_activity(container_id)
+    except NoCapacity:
+        logger.warning(f"Resume failed. No node has room for container {container_id}")
+        raise HTTPException(503, "No capacity to resume the container")
+    except ResumeFailed as e:
+        logger.warning(f"Resume failed. {e}")
+        raise HTTPException(503, "The container could not be resumed, try again")
+
 @router.post("/containers/{container_id}/envs")
 async def create_env(container_id: str, body: CreateEnvRequest):
     logger.info(f"Creating env {body.env_id} for container {container_id}")
+    await record_activity(container_id)
     success = await service.create_env(container_id, body.env_id)
     if not success:
         logger.warning(f"Failed to create env. Container not found: {container_id}")
@@ -41,6 +56,7 @@ async def delete_env(container_id: str, env_id: str):
 @router.post("/containers/{container_id}/envs/{env_id}/execute")
 async def execute_cell(container_id: str, env_id: str, body: ExecuteCellRequest):
     logger.info(f"Executing code in env {env_id} (container {container_id})")
+    await record_activity(container_id)
     if not await service.get_env(container_id, env_id):
         logger.warning(f"Execution failed. Environment not found: {env_id}")
         raise HTTPException(404, "Environment not found")
@@ -57,6 +73,7 @@ async def execute_cell(container_id: str, env_id: str, body: ExecuteCellRequest)
 @router.post("/containers/{container_id}/envs/{env_id}/restart")
 async def restart_env(container_id: str, env_id: str):
     logger.info(f"Restarting env {env_id} in container {container_id}")
+    await record_activity(container_id)
     success = await service.clear_env_state(container_id, env_id)
     if not success:
         logger.warning(f"Restart failed. Environment not found: {env_id}")
@@ -67,6 +84,7 @@ async def restart_env(container_id: str, env_id: str):
 @router.post("/containers/{container_id}/envs/{env_id}/interrupt")
 async def interrupt_env(container_id: str, env_id: str):
     logger.info(f"Interrupting env {env_id} in container {container_id}")
+    await record_activity(container_id)
     if not await service.get_env(container_id, env_id):
         logger.warning(f"Interrupt failed. Environment not found: {env_id}")
         raise HTTPException(404, "Environment not found")
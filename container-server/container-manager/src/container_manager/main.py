@@ -1,12 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from .container.pool import warm_pool
+from .container.ports import port_allocator
+from .container.reaper import idle_reaper
 from .container.router import router as container_router
 from .envs.router import router as envs_router
+from .nodes.router import router as nodes_router
+from .nodes.scheduler import scheduler
 
-app = FastAPI(title="Container Notebook API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await scheduler.start()
+    await warm_pool.start()
+    await idle_reaper.start()
+    yield
+    await idle_reaper.close()
+    await warm_pool.close()
+    await scheduler.close()
+
+app = FastAPI(title="Container Notebook API", lifespan=lifespan)
 
 app.include_router(container_router)
 app.include_router(envs_router)
+app.include_router(nodes_router)
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "warm_pool": await warm_pool.metrics(),
+        "host_ports": await port_allocator.metrics(),
+        "scheduler": scheduler.metrics(),
+        "idle_reaper": idle_reaper.metrics(),
+    }
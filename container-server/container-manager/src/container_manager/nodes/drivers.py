@@ -0,0 +1,141 @@
+import itertools
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Set, Tuple
+
+import docker
+import httpx
+from docker.errors import NotFound
+from container_manager.config import NodeConfig
+
+PortBinding = Tuple[str, str]
+
+
+class NodeDriver(ABC):
+    """Runs containers on one node. Calls block and are made from the threadpool."""
+
+    def __init__(self, node: NodeConfig):
+        self.node = node
+
+    @abstractmethod
+    def run(self, name: str, container_port: str, host_port: Optional[int], **kwargs: Any) -> PortBinding:
+        """Start a container and return the (host ip, host port) its port is published on."""
+
+    @abstractmethod
+    def remove(self, name: str) -> bool:
+        """Force-remove a container; False if it did not exist."""
+
+    @abstractmethod
+    def remove_volume(self, name: str) -> bool:
+        """Remove a volume; False if it did not exist."""
+
+    @abstractmethod
+    def capacity(self) -> Tuple[float, int]:
+        """(CPUs, bytes of memory) of the node."""
+
+    @abstractmethod
+    def list_containers(self) -> Set[str]:
+        """Names of the containers the manager created on the node, running or not."""
+
+    async def is_healthy(self, port: str, path: str = "/health", timeout: float = 1.0) -> bool:
+        try:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                response = await client.get(f"http://{self.node.address}:{port}{path}")
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+
+class DockerDriver(NodeDriver):
+    def __init__(self, node: NodeConfig):
+        super().__init__(node)
+        self._client: Optional[docker.DockerClient] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> docker.DockerClient:
+        # Connect on first use, so an unreachable node does not stop the manager from starting
+        with self._lock:
+            if self._client is None:
+                if self.node.base_url:
+                    self._client = docker.DockerClient(base_url=self.node.base_url)
+                else:
+                    self._client = docker.from_env()
+            return self._client
+
+    def run(self, name: str, container_port: str, host_port: Optional[int], **kwargs: Any) -> PortBinding:
+        docker_container = self.client.containers.run(
+            name=name,
+            detach=True,
+            ports={container_port: host_port},
+            **kwargs,
+        )
+        docker_container.reload()
+        port_info = docker_container.attrs["NetworkSettings"]["Ports"][container_port][0]
+        return port_info["HostIp"], port_info["HostPort"]
+
+    def remove(self, name: str) -> bool:
+        try:
+            self.client.containers.get(name).remove(force=True)
+            return True
+        except NotFound:
+            return False
+
+    def remove_volume(self, name: str) -> bool:
+        try:
+            self.client.volumes.get(name).remove(force=True)
+            return True
+        except NotFound:
+            return False
+
+    def capacity(self) -> Tuple[float, int]:
+        info: Dict[str, Any] = self.client.info()
+        cpus = self.node.cpus if self.node.cpus is not None else float(info["NCPU"])
+        memory = self.node.memory if self.node.memory is not None else int(info["MemTotal"])
+        return cpus, memory
+
+    def list_containers(self) -> Set[str]:
+        found = self.client.containers.list(all=True, filters={"label": "created_by=container_manager"})
+        return {docker_container.name for docker_container in found if docker_container.name}
+
+
+class FakeDriver(NodeDriver):
+    """Pretends to run containers, so placement can be tried without Docker hosts."""
+
+    def __init__(self, node: NodeConfig):
+        super().__init__(node)
+        self.containers: Dict[str, str] = {}
+        self.volumes: set[str] = set()
+        self._ports = itertools.count(49152)
+
+    def run(self, name: str, container_port: str, host_port: Optional[int], **kwargs: Any) -> PortBinding:
+        if name in self.containers:
+            raise RuntimeError(f"Container {name} already exists")
+        port = str(host_port if host_port is not None else next(self._ports))
+        self.containers[name] = port
+        self.volumes.update(kwargs.get("volumes") or {})
+        return "0.0.0.0", port
+
+    def remove(self, name: str) -> bool:
+        return self.containers.pop(name, None) is not None
+
+    def remove_volume(self, name: str) -> bool:
+        if name not in self.volumes:
+            return False
+        self.volumes.discard(name)
+        return True
+
+    def capacity(self) -> Tuple[float, int]:
+        return self.node.cpus or 8.0, self.node.memory or 16 * 1024**3
+
+    def list_containers(self) -> Set[str]:
+        return set(self.containers)
+
+    async def is_healthy(self, port: str, path: str = "/health", timeout: float = 1.0) -> bool:
+        return port in self.containers.values()
+
+
+def create_driver(node: NodeConfig) -> NodeDriver:
+    if node.driver == "fake":
+        return FakeDriver(node)
+    return DockerDriver(node)
@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+from .scheduler import scheduler
+
+router = APIRouter()
+
+@router.get("/nodes")
+async def list_nodes():
+    return {"nodes": await scheduler.list_nodes()}
@@ -0,0 +1,296 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from docker.utils import parse_bytes
+from fastapi.concurrency import run_in_threadpool
+from redis.asyncio import Redis
+from container_manager.config import NodeConfig, Settings, settings
+from container_manager.connections import redis_client
+from container_manager.container.ports import port_allocator
+from container_manager.util import logger
+from .drivers import NodeDriver, create_driver
+
+# Takes a reservation on a node only if it still fits, so managers placing at the
+# same time cannot overcommit it.
+# KEYS: node hash, node allocated hash, container -> reservation hash,
+#       container -> reservation time hash
+# ARGV: cpus, memory, container id, node id, now
+RESERVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local cpus = tonumber(ARGV[1])
+local memory = tonumber(ARGV[2])
+local capacity_cpus = tonumber(redis.call('HGET', KEYS[1], 'cpus'))
+local capacity_memory = tonumber(redis.call('HGET', KEYS[1], 'memory'))
+local used_cpus = tonumber(redis.call('HGET', KEYS[2], 'cpus') or '0')
+local used_memory = tonumber(redis.call('HGET', KEYS[2], 'memory') or '0')
+if used_cpus + cpus > capacity_cpus + 1e-9 or used_memory + memory > capacity_memory then
+    return 0
+end
+redis.call('HINCRBYFLOAT', KEYS[2], 'cpus', cpus)
+redis.call('HINCRBY', KEYS[2], 'memory', memory)
+redis.call('HINCRBY', KEYS[2], 'containers', 1)
+redis.call('HSET', KEYS[3], ARGV[3], ARGV[4] .. '|' .. ARGV[1] .. '|' .. ARGV[2])
+redis.call('HSET', KEYS[4], ARGV[3], ARGV[5])
+return 1
+"""
+
+# Gives back what a container reserved on a node, if the reservation is still there.
+# KEYS: container -> reservation hash, container -> reservation time hash, node allocated hash
+# ARGV: container id, node id
+RELEASE_SCRIPT = """
+local reservation = redis.call('HGET', KEYS[1], ARGV[1])
+if not reservation then
+    return 0
+end
+local node, cpus, memory = string.match(reservation, '^(.*)|([^|]*)|([^|]*)$')
+if node ~= ARGV[2] then
+    return 0
+end
+redis.call('HINCRBYFLOAT', KEYS[3], 'cpus', -tonumber(cpus))
+redis.call('HINCRBY', KEYS[3], 'memory', -tonumber(memory))
+redis.call('HINCRBY', KEYS[3], 'containers', -1)
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+return 1
+"""
+
+# Recomputes what is handed out on a node from the reservations on it, so the
+# counters cannot drift from them.
+# KEYS: container -> reservation hash, node allocated hash; ARGV: node id
+REBUILD_SCRIPT = """
+local cpus, memory, containers = 0, 0, 0
+local reservations = redis.call('HVALS', KEYS[1])
+for _, reservation in ipairs(reservations) do
+    local node, c, m = string.match(reservation, '^(.*)|([^|]*)|([^|]*)$')
+    if node == ARGV[1] then
+        cpus = cpus + tonumber(c)
+        memory = memory + tonumber(m)
+        containers = containers + 1
+    end
+end
+redis.call('HSET', KEYS[2], 'cpus', tostring(cpus), 'memory', string.format('%d', memory), 'containers', containers)
+return containers
+"""
+
+
+class NoCapacity(Exception):
+    pass
+
+
+class Scheduler:
+    """Places containers on the configured Docker hosts.
+
+    Every manager heartbeats the nodes it is configured with into `node:{id}`
+    (capacity, address) with a TTL, so a node that stops answering drops out of
+    placement after NODE_HEARTBEAT_TTL_SECONDS. What has been handed out on a node
+    is tracked in `node:{id}:allocated`, and each container's reservation in
+    `container_nodes`, so any manager can route calls for a container and give its
+    resources back. Each heartbeat also checks the node's reservations against the
+    containers actually on it: one whose container has been missing for
+    NODE_RESERVATION_GRACE_SECONDS (a manager died between placing and starting
+    it) is released, and the node's counters are rebuilt from what is left.
+
+    Placement reserves CONTAINER_CPUS and CONTAINER_MEMORY on the chosen node.
+    "binpack" prefers the node with the least memory left that still fits, which
+    keeps other nodes free for large or bursty work; "spread" prefers the node
+    with the most left.
+    """
+
+    NODES_KEY = "nodes"
+    RESERVATIONS_KEY = "container_nodes"
+    RESERVED_AT_KEY = "container_nodes:reserved_at"
+
+    def __init__(self, redis: Redis, settings: Settings):
+        self.redis = redis
+        self.settings = settings
+        nodes = settings.NODES or [NodeConfig(id="local", address=settings.CONTAINER_HOST)]
+        self.drivers: Dict[str, NodeDriver] = {node.id: create_driver(node) for node in nodes}
+        self._reserve = self.redis.register_script(RESERVE_SCRIPT)
+        self._release = self.redis.register_script(RELEASE_SCRIPT)
+        self._rebuild = self.redis.register_script(REBUILD_SCRIPT)
+        self._task: Optional[asyncio.Task] = None
+        self.placements_total = 0
+        self.no_capacity_total = 0
+        self.reclaimed_total = 0
+
+    def _node_key(self, node_id: str) -> str:
+        return f"node:{node_id}"
+
+    def _allocated_key(self, node_id: str) -> str:
+        return f"node:{node_id}:allocated"
+
+    def request(self) -> Tuple[float, int]:
+        memory = int(parse_bytes(self.settings.CONTAINER_MEMORY)) if self.settings.CONTAINER_MEMORY else 0
+        return max(self.settings.CONTAINER_CPUS, 0.0), memory
+
+    @property
+    def default_node(self) -> str:
+        # Where containers created before nodes were tracked live
+        return next(iter(self.drivers))
+
+    def driver(self, node_id: str) -> NodeDriver:
+        driver = self.drivers.get(node_id)
+        if driver is None:
+            raise KeyError(f"Node {node_id} is not configured on this manager")
+        return driver
+
+    async def heartbeat(self, node_id: str) -> bool:
+        driver = self.drivers[node_id]
+        try:
+            cpus, memory = await run_in_threadpool(driver.capacity)
+        except Exception as e:
+            logger.warning(f"Node {node_id} is not responding: {e}")
+            return False
+        key = self._node_key(node_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={
+                "cpus": cpus * self.settings.NODE_CPU_OVERCOMMIT,
+                "memory": memory,
+                "address": driver.node.address,
+                "heartbeat_at": time.time(),
+            })
+            pipe.expire(key, self.settings.NODE_HEARTBEAT_TTL_SECONDS)
+            pipe.sadd(self.NODES_KEY, node_id)
+            await pipe.execute()
+        try:
+            await self.reconcile(node_id)
+        except Exception as e:
+            logger.warning(f"Could not reconcile reservations on node {node_id}: {e}")
+        return True
+
+    async def reconcile(self, node_id: str) -> List[str]:
+        """Release reservations on a node whose container is gone; returns their ids."""
+        names = await run_in_threadpool(self.drivers[node_id].list_containers)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.RESERVATIONS_KEY)
+            pipe.hgetall(self.RESERVED_AT_KEY)
+            reservations, reserved_at = await pipe.execute()
+        # Reservations from before they were timestamped count as old
+        cutoff = time.time() - self.settings.NODE_RESERVATION_GRACE_SECONDS
+        stale = [
+            container_id for container_id, reservation in reservations.items()
+            if reservation.rsplit("|", 2)[0] == node_id and container_id not in names
+            and float(reserved_at.get(container_id, 0)) < cutoff
+        ]
+        for container_id in stale:
+            logger.warning(f"Releasing reservation of container {container_id}, which is not on node {node_id}")
+            await port_allocator.release(container_id)
+            await self.release(container_id)
+        self.reclaimed_total += len(stale)
+        await self._rebuild(keys=[self.RESERVATIONS_KEY, self._allocated_key(node_id)], args=[node_id])
+        return stale
+
+    async def list_nodes(self) -> List[Dict[str, Any]]:
+        node_ids = sorted(await self.redis.smembers(self.NODES_KEY))  # pyright: ignore[reportGeneralTypeIssues]
+        nodes = []
+        for node_id in node_ids:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hgetall(self._node_key(node_id))
+                pipe.hgetall(self._allocated_key(node_id))
+                node, allocated = await pipe.execute()
+            cpus = float(node.get("cpus", 0))
+            memory = int(node.get("memory", 0))
+            used_cpus = float(allocated.get("cpus", 0))
+            used_memory = int(allocated.get("memory", 0))
+            nodes.append({
+                "id": node_id,
+                "live": bool(node),
+                "address": node.get("address"),
+                "cpus": cpus,
+                "memory": memory,
+                "free_cpus": cpus - used_cpus,
+                "free_memory": memory - used_memory,
+                "containers": int(allocated.get("containers", 0)),
+            })
+        return nodes
+
+    def _rank(self, nodes: List[Dict[str, Any]], cpus: float, memory: int) -> List[Dict[str, Any]]:
+        fitting = [
+            node for node in nodes
+            if node["live"] and node["id"] in self.drivers
+            and node["free_cpus"] + 1e-9 >= cpus and node["free_memory"] >= memory
+        ]
+        if self.settings.SCHEDULER_STRATEGY == "spread":
+            return sorted(fitting, key=lambda node: (-node["free_memory"], -node["free_cpus"], node["containers"]))
+        return sorted(fitting, key=lambda node: (node["free_memory"], node["free_cpus"], -node["containers"]))
+
+    async def place(
+        self, container_id: str, node_id: Optional[str] = None, exclude: frozenset[str] = frozenset()
+    ) -> str:
+        """Reserve room for a container on a node and return the node id.
+
+        `node_id` pins the container to that node, e.g. because its workspace
+        volume lives there. Nodes in `exclude` are skipped, e.g. because they
+        have no host ports left.
+        """
+        cpus, memory = self.request()
+        nodes = [node for node in await self.list_nodes() if node["id"] not in exclude]
+        if node_id is not None:
+            nodes = [node for node in nodes if node["id"] == node_id]
+        for node in self._rank(nodes, cpus, memory):
+            reserved = await self._reserve(
+                keys=[
+                    self._node_key(node["id"]), self._allocated_key(node["id"]),
+                    self.RESERVATIONS_KEY, self.RESERVED_AT_KEY,
+                ],
+                args=[cpus, memory, container_id, node["id"], time.time()],
+            )
+            if reserved:
+                self.placements_total += 1
+                return node["id"]
+        self.no_capacity_total += 1
+        raise NoCapacity("No node has room for another container")
+
+    async def node_of(self, container_id: str) -> Optional[str]:
+        reservation = await self.redis.hget(self.RESERVATIONS_KEY, container_id)  # pyright: ignore[reportGeneralTypeIssues]
+        if reservation is None:
+            return None
+        return reservation.rsplit("|", 2)[0]
+
+    async def release(self, container_id: str) -> None:
+        node_id = await self.node_of(container_id)
+        if node_id is None:
+            return
+        await self._release(
+            keys=[self.RESERVATIONS_KEY, self.RESERVED_AT_KEY, self._allocated_key(node_id)],
+            args=[container_id, node_id],
+        )
+
+    async def _run(self) -> None:
+        while True:
+            for node_id in self.drivers:
+                try:
+                    await self.heartbeat(node_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Heartbeat for node {node_id} failed: {e}")
+            await asyncio.sleep(self.settings.NODE_HEARTBEAT_SECONDS)
+
+    async def start(self) -> None:
+        if self._task is None:
+            # Report in before serving, so the first create has somewhere to go
+            await asyncio.gather(*(self.heartbeat(node_id) for node_id in self.drivers))
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.settings.SCHEDULER_STRATEGY,
+            "placements_total": self.placements_total,
+            "no_capacity_total": self.no_capacity_total,
+            "reclaimed_total": self.reclaimed_total,
+        }
+
+
+scheduler = Scheduler(redis_client, settings)
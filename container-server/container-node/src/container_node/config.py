@@ -4,6 +4,8 @@ import pwd
 
 class Settings(BaseSettings):
     username: str
+    # Full rescan interval of the file listing index; 0 disables it
+    file_index_reconcile_seconds: float = 30.0
 
     @property
     def home_path(self) -> str:
@@ -0,0 +1,163 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    from watchfiles import awatch
+except ImportError:
+    # watchfiles normally comes with fastapi[standard]; without it only the periodic rescan runs
+    awatch = None
+
+SORT_KEYS = {
+    "filename": lambda entry: entry["filename"].lower(),
+    "size": lambda entry: entry["size"],
+    "uploadedAt": lambda entry: entry["uploadedAt"],
+}
+
+
+def _describe(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        if not path.is_file():
+            return None
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return {
+        "id": path.name,
+        "filename": path.name,
+        "size": stat.st_size,
+        "uploadedAt": datetime.fromtimestamp(stat.st_ctime, tz=timezone.utc).isoformat(),
+    }
+
+
+def _scan(root: Path) -> Dict[str, Dict[str, Any]]:
+    entries: Dict[str, Dict[str, Any]] = {}
+    if not root.exists():
+        return entries
+    with os.scandir(root) as it:
+        for entry in it:
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries[entry.name] = {
+                "id": entry.name,
+                "filename": entry.name,
+                "size": stat.st_size,
+                "uploadedAt": datetime.fromtimestamp(stat.st_ctime, tz=timezone.utc).isoformat(),
+            }
+    return entries
+
+
+class FileIndex:
+    """In-memory listing of the files in the home directory.
+
+    Listing is served from memory instead of walking the directory and stat-ing
+    every file per request. The API updates the index on upload and delete; files
+    written by anything else (the notebook kernel, /run-command) are picked up by
+    an inotify watcher when watchfiles is available, and a full rescan every
+    `reconcile_seconds` corrects anything the watcher missed.
+    """
+
+    def __init__(self, root: Path, reconcile_seconds: float):
+        self.root = root
+        self.reconcile_seconds = reconcile_seconds
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._ready = False
+        self._lock = asyncio.Lock()
+        self._version = 0
+        # (sort, order) -> (version, sorted entries)
+        self._sorted: Dict[Tuple[str, str], Tuple[int, List[Dict[str, Any]]]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def refresh(self) -> None:
+        """Rescan the directory and replace the index with what is on disk."""
+        async with self._lock:
+            entries = await run_in_threadpool(_scan, self.root)
+            if entries != self._entries:
+                self._entries = entries
+                self._version += 1
+            self._ready = True
+
+    async def ensure_ready(self) -> None:
+        if not self._ready:
+            await self.refresh()
+
+    async def update(self, path: Path) -> None:
+        if path.parent != self.root:
+            return
+        entry = await run_in_threadpool(_describe, path)
+        if entry is None:
+            self.remove(path.name)
+            return
+        self._entries[path.name] = entry
+        self._version += 1
+
+    def remove(self, name: str) -> None:
+        if self._entries.pop(name, None) is not None:
+            self._version += 1
+
+    def _sorted_entries(self, sort: str, order: str) -> List[Dict[str, Any]]:
+        cached = self._sorted.get((sort, order))
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
+        entries = sorted(self._entries.values(), key=SORT_KEYS[sort], reverse=order == "desc")
+        self._sorted[(sort, order)] = (self._version, entries)
+        return entries
+
+    async def list(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        sort: str = "filename",
+        order: str = "asc",
+        q: Optional[str] = None,
+        extension: Optional[str] = None,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Matching entries as (total, page)."""
+        await self.ensure_ready()
+        entries = self._sorted_entries(sort, order)
+        if q:
+            needle = q.lower()
+            entries = [entry for entry in entries if needle in entry["filename"].lower()]
+        if extension:
+            suffix = extension.lower() if extension.startswith(".") else f".{extension.lower()}"
+            entries = [entry for entry in entries if entry["filename"].lower().endswith(suffix)]
+        end = None if limit is None else offset + limit
+        return len(entries), [dict(entry) for entry in entries[offset:end]]
+
+    async def _reconcile(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print("File index rescan failed:", e)
+
+    async def _watch(self) -> None:
+        async for changes in awatch(self.root, recursive=False):
+            for _, changed in changes:
+                await self.update(Path(changed))
+
+    async def start(self) -> None:
+        await self.refresh()
+        if self.reconcile_seconds > 0:
+            self._tasks.append(asyncio.create_task(self._reconcile()))
+        if awatch is not None and self.root.exists():
+            self._tasks.append(asyncio.create_task(self._watch()))
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
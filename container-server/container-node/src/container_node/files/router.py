@@ -1,12 +1,14 @@
 import os
 import shutil
 from pathlib import Path
-from typing import List
+from typing import Literal, Optional
 from datetime import datetime, timezone
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from functools import lru_cache
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Response
 from fastapi.responses import FileResponse
 
 from container_node.config import get_settings
+from container_node.files.index import FileIndex
 
 router = APIRouter(prefix="/files", tags=["files"])
 
@@ -14,6 +16,11 @@ def get_upload_dir() -> Path:
     settings = get_settings()
     return Path(settings.home_path).resolve()
 
+@lru_cache
+def get_file_index() -> FileIndex:
+    settings = get_settings()
+    return FileIndex(get_upload_dir(), settings.file_index_reconcile_seconds)
+
 ALLOWED_EXTENSIONS = {'.csv', '.xlsx', '.json', '.txt', '.md', '.pdf'}
 
 def validate_file_extension(filename: str):
@@ -50,6 +57,7 @@ async def upload_file(file: UploadFile = File(...)):
         
         with open(file_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
+        await get_file_index().update(file_path)
             
         return {
             "id": file.filename,
@@ -62,20 +70,18 @@ async def upload_file(file: UploadFile = File(...)):
 
 
 @router.get("")
-async def fetch_files():
+async def fetch_files(
+    response: Response,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    sort: Literal["filename", "size", "uploadedAt"] = "filename",
+    order: Literal["asc", "desc"] = "asc",
+    q: Optional[str] = None,
+    extension: Optional[str] = None,
+):
     try:
-        files = []
-        upload_dir = get_upload_dir()
-        if upload_dir.exists():
-            for file_path in upload_dir.iterdir():
-                if file_path.is_file():
-                    stat = file_path.stat()
-                    files.append({
-                        "id": file_path.name,
-                        "filename": file_path.name,
-                        "size": stat.st_size,
-                        "uploadedAt": datetime.fromtimestamp(stat.st_ctime, tz=timezone.utc).isoformat()
-                    })
+        total, files = await get_file_index().list(offset, limit, sort, order, q, extension)
+        response.headers["X-Total-Count"] = str(total)
         return files
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -111,6 +117,7 @@ async def delete_file(file_id: str):
             shutil.rmtree(file_path)
         else:
             os.remove(file_path)
+        get_file_index().remove(file_path.name)
             
         return {"message": f"File {file_id} deleted successfully"}
     except HTTPException:
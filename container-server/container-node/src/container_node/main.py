@@ -1,13 +1,21 @@
 from fastapi.param_functions import Body
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
 import subprocess
 import shlex
 from container_node.code_interpreter.python_notebook import PythonNotebook
 from container_node.config import get_settings
-from container_node.files.router import router as files_router
+from container_node.files.router import router as files_router, get_file_index
 from container_node.environment.router import router as envs_router
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    file_index = get_file_index()
+    await file_index.start()
+    yield
+    await file_index.close()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(files_router)
 app.include_router(envs_router)
 